@@ -0,0 +1,186 @@
+"""Tahta tarafı ajanı: imzalı UDP kilit komutlarını dinler, yerelde çalıştırır.
+
+Panel / servis her zilde tek bir çoklu yayın paketi yollar; ajan imzayı ve
+zaman damgasını doğrular, komutu (etap_beacon.COMMANDS) çalıştırır ve
+sonucu gönderene unicast olarak bildirir. Onay gelmeyen tahtalara panel SSH
+ile bağlanmaya devam eder, yani ajan kurulmamış tahtalar da çalışır.
+
+Panelden gelen zil programı (sync) ajanın klasöründeki program.json'a yazılır
+ve ajan zilleri kendisi uygular: panel bilgisayarı kapalı olsa da tahta
+derste kilitlenir. Her onay programın içerik özetini (digest) taşır.
+
+    sudo python3 etap_agent.py /opt/EtapKilitAjan     # ajan.json: {"key": "..."}
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from etap_beacon import BEACON_GROUP, BEACON_PORT, COMMANDS, OUTPUT_LIMIT, open_socket, pack, unpack
+from etap_data import DataManager
+from etap_schedule import DAYS, BellScheduler, CompiledSchedule, apply_diff, merge_days, schedule_digest
+
+AGENT_FILE = "ajan.json"
+
+
+def log(msg):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {msg}", flush=True)
+
+
+class BoardAgent:
+    """Bir tahtada çalışan UDP dinleyicisi.
+
+    Aynı paket (id) ikinci kez gelirse komut yeniden çalıştırılmaz, önceki
+    onay tekrar gönderilir. max_skew saniyeden eski ya da ileri tarihli
+    paketler (yeniden oynatma) yok sayılır; bu nedenle tahta saatleri NTP ile
+    eşitlenmiş olmalıdır.
+    """
+
+    def __init__(self, key, group=BEACON_GROUP, port=BEACON_PORT, interface=None, max_skew=60, command_timeout=10,
+                 enforce=True):
+        self.key = key.encode() if isinstance(key, str) else key
+        self.group = group
+        self.port = port
+        self.interface = interface
+        self.max_skew = max_skew
+        self.command_timeout = command_timeout
+        # id -> gönderilen onay (hedef değilsek None)
+        self._seen = OrderedDict()
+        self._local = {}
+        # Parça parça gelen program: (digest, base) -> {parça no: günler}
+        self._staging = (None, {})
+        self._running = True
+        self.set_schedule(DataManager.load_json(DataManager.SCHEDULE_FILE, {day: [] for day in DAYS}))
+        # Yerel zil: hedef yalnızca bu tahta
+        self.bell = BellScheduler(lambda: self.compiled, lambda: ["yerel"], self._local_wave) if enforce else None
+
+    def set_schedule(self, schedule):
+        self.schedule = schedule
+        self.compiled = CompiledSchedule.compile(schedule, strict=False)
+        self.digest = schedule_digest(schedule)
+
+    def serve(self):
+        if self.bell:
+            self.bell.start()
+        with open_socket(self.group, self.port, self.interface) as sock:
+            sock.settimeout(1.0)
+            while self._running:
+                try:
+                    data, addr = sock.recvfrom(65535)
+                except socket.timeout:
+                    continue
+                reply = self.handle(data, addr[0])
+                if reply:
+                    sock.sendto(reply, addr)
+
+    def stop(self):
+        self._running = False
+        if self.bell:
+            self.bell.stop()
+
+    def handle(self, data, sender):
+        msg = unpack(self.key, data)
+        if msg is None or "id" not in msg:
+            return None
+        if msg["id"] in self._seen:
+            return self._seen[msg["id"]]
+        if abs(time.time() - msg.get("ts", 0)) > self.max_skew:
+            log(f"{sender}: zaman damgası geçersiz, paket yok sayıldı.")
+            return None
+        reply = None
+        targets = msg.get("targets")
+        if targets is None or self.local_ip(sender) in targets:
+            result = self.run(msg)
+            log(f"{sender}: {msg.get('action')} -> çıkış kodu {result['exit_code']}")
+            reply = pack(self.key, {"id": msg["id"], **result, "digest": self.digest})
+        self._seen[msg["id"]] = reply
+        while len(self._seen) > 256:
+            self._seen.popitem(last=False)
+        return reply
+
+    def run(self, msg):
+        action = msg.get("action")
+        if action == "sync":
+            return self.sync(msg)
+        if action == "status":
+            return {"exit_code": 0, "stdout": "", "stderr": ""}
+        if action not in COMMANDS:
+            return {"exit_code": 2, "stdout": "", "stderr": f"bilinmeyen komut: {action}"}
+        try:
+            out = subprocess.run(COMMANDS[action], shell=True, capture_output=True, text=True, timeout=self.command_timeout)
+        except subprocess.TimeoutExpired:
+            return {"exit_code": -1, "stdout": "", "stderr": "komut süresi aşıldı"}
+        return {"exit_code": out.returncode, "stdout": out.stdout[:OUTPUT_LIMIT], "stderr": out.stderr[:OUTPUT_LIMIT]}
+
+    def sync(self, msg):
+        # Program parçalar halinde gelir ("part"/"parts", her biri tek pakete
+        # sığar): "base" varsa o sürüme göre değişen günler, yoksa tam program.
+        # Son parçayla birleştirilen sonucun özeti "digest" ile aynı değilse
+        # uygulanmaz. Eski panellerin tek paketlik "schedule" biçimi de geçerlidir.
+        if "base" in msg and msg["base"] != self.digest:
+            return {"exit_code": 3, "stdout": "", "stderr": "program sürümü farklı, tam program gerekli"}
+        if "schedule" in msg:
+            schedule = msg["schedule"]
+        else:
+            key = (msg.get("digest"), msg.get("base"))
+            if self._staging[0] != key:
+                self._staging = (key, {})
+            parts = self._staging[1]
+            parts[msg.get("part", 0)] = msg.get("days", {})
+            total = msg.get("parts", 1)
+            if len(parts) < total:
+                return {"exit_code": 0, "stdout": f"parça {len(parts)}/{total}", "stderr": ""}
+            self._staging = (None, {})
+            days = merge_days(parts[i] for i in sorted(parts))
+            schedule = apply_diff(self.schedule, days) if "base" in msg else days
+        if schedule_digest(schedule) != msg.get("digest"):
+            return {"exit_code": 4, "stdout": "", "stderr": "program özeti tutmuyor"}
+        if schedule_digest(schedule) == self.digest:
+            return {"exit_code": 0, "stdout": "", "stderr": ""}
+        try:
+            DataManager.save_json(DataManager.SCHEDULE_FILE, schedule)
+        except OSError as e:
+            return {"exit_code": 1, "stdout": "", "stderr": f"program kaydedilemedi: {e}"}
+        self.set_schedule(schedule)
+        if self.bell:
+            self.bell.reload()
+        return {"exit_code": 0, "stdout": "", "stderr": ""}
+
+    def _local_wave(self, ips, action):
+        result = self.run({"action": action})
+        log(f"Zil (yerel): {action} -> çıkış kodu {result['exit_code']}")
+        return [result]
+
+    def local_ip(self, peer):
+        # Panelin bu tahtayı tanıdığı adres: panele giden yolun kaynak adresi
+        if peer not in self._local:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.connect((peer, 9))
+                self._local[peer] = s.getsockname()[0]
+        return self._local[peer]
+
+
+def main():
+    if len(sys.argv) > 1:
+        os.chdir(sys.argv[1])
+    config = DataManager.load_json(AGENT_FILE, {})
+    if not config.get("key"):
+        log(f"{AGENT_FILE} içinde 'key' yok; panelin ayarlar.json 'beacon_key' değeriyle aynı olmalı.")
+        sys.exit(1)
+    agent = BoardAgent(
+        config["key"], config.get("group", BEACON_GROUP), config.get("port", BEACON_PORT),
+        config.get("interface"), config.get("max_skew", 60), config.get("command_timeout", 10),
+        enforce=config.get("enforce", True))
+    signal.signal(signal.SIGTERM, lambda *a: agent.stop())
+    signal.signal(signal.SIGINT, lambda *a: agent.stop())
+    log(f"Ajan dinliyor: {agent.group}:{agent.port} (program {agent.digest[:8]})")
+    agent.serve()
+    log("Ajan durdu.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import hashlib
+import hmac
+import json
+import os
+import select
+import socket
+import time
+
+from etap_metrics import METRICS
+
+# Yönetimsel kapsamlı çoklu yayın adresi; "255.255.255.255" ya da alt ağ
+# yayın adresi verilirse yayın (broadcast) kullanılır
+BEACON_GROUP = "239.255.46.197"
+BEACON_PORT = 46197
+
+# Tahtaların çalıştırdığı komutlar (SSH ile ya da ajan tarafından yerelde)
+COMMANDS = {
+    "lock": "dbus-send --system --dest=org.freedesktop.DisplayManager --type=method_call /org/freedesktop/DisplayManager/Seat0 org.freedesktop.DisplayManager.Seat.Lock",
+    # Kesin Çözüm Kilit Açma
+    "unlock": "dbus-send --system --dest=org.freedesktop.login1 /org/freedesktop/login1 org.freedesktop.login1.Manager.UnlockSessions",
+}
+
+# IP parçalanmasına düşmemek için bir pakette gönderilen en fazla hedef ve
+# en büyük paket (1500 MTU - IP/UDP başlıkları, tünel payıyla)
+CHUNK = 64
+PACKET_LIMIT = 1400
+# Onaylarda taşınan en fazla çıktı karakteri
+OUTPUT_LIMIT = 300
+
+
+def _sign(key, body):
+    return hmac.new(key, body, hashlib.sha256).hexdigest().encode()
+
+
+def pack(key, msg):
+    # Paket: "<hmac-sha256 hex> <json>"; anahtar ayarlar.json / ajan.json'da
+    body = json.dumps(msg, ensure_ascii=False, separators=(",", ":")).encode()
+    return _sign(key, body) + b" " + body
+
+
+def unpack(key, data):
+    sig, _, body = data.partition(b" ")
+    if not hmac.compare_digest(sig, _sign(key, body)):
+        return None
+    try:
+        msg = json.loads(body)
+    except ValueError:
+        return None
+    return msg if isinstance(msg, dict) else None
+
+
+def open_socket(group, port=None, interface=None):
+    # port verilirse o porta bağlanır ve (çoklu yayın adresiyse) gruba katılır
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    # 500 tahtanın aynı anda gelen onayları düşmesin
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    multicast = socket.inet_aton(group)[0] in range(224, 240)
+    if port is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("", port))
+        if multicast:
+            mreq = socket.inet_aton(group) + socket.inet_aton(interface or "0.0.0.0")
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    elif multicast:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        if interface:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+    return sock
+
+
+class Beacon:
+    """Tek UDP paketiyle tüm okula kilit/kilit açma komutu gönderir.
+
+    Paket paylaşılan anahtarla HMAC imzalıdır; tahtalardaki etap_agent.py
+    komutu yerelde çalıştırır ve sonucu (çıkış kodu, çıktı) imzalı bir
+    unicast onayla geri yollar. send() yalnızca onay veren tahtaları döndürür:
+    onay gelmeyenler için çağıran SSH'a döner. Yarı sürede eksik onay varsa
+    paket bir kez daha yollanır (ajan aynı komutu iki kez çalıştırmaz).
+    """
+
+    def __init__(self, key, group=BEACON_GROUP, port=BEACON_PORT, wait=1.0, interface=None, metrics=METRICS):
+        self.key = key.encode() if isinstance(key, str) else key
+        self.group = group
+        self.port = port
+        self.wait = wait
+        self.interface = interface
+        self.metrics = metrics
+
+    def send(self, action, targets, everyone=False, extra=None):
+        # targets: onay beklenen IP'ler. everyone=True hedef listesi göndermez,
+        # paketi alan her tahta çalıştırır (zil: tek paket). Dönüş: {ip: onay}
+        expected = set(targets)
+        if not expected:
+            return {}
+        msg = {"id": os.urandom(8).hex(), "ts": time.time(), "action": action, **(extra or {})}
+        packets = [pack(self.key, msg)] if everyone else self._packets(msg, sorted(expected))
+        if max(map(len, packets)) > PACKET_LIMIT:
+            raise ValueError(f"paket {PACKET_LIMIT} baytı aşıyor ({action})")
+        acks = {}
+        with open_socket(self.group, interface=self.interface) as sock:
+            t0 = time.monotonic()
+            deadline = t0 + self.wait
+            resend_at = t0 + self.wait / 2
+            self._transmit(sock, packets)
+            while len(acks) < len(expected):
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if resend_at and now >= resend_at:
+                    self._transmit(sock, packets)
+                    resend_at = None
+                ready, _, _ = select.select([sock], [], [], (resend_at or deadline) - now)
+                if not ready:
+                    continue
+                data, (host, _) = sock.recvfrom(4096)
+                ack = unpack(self.key, data)
+                if ack is None or ack.get("id") != msg["id"] or host not in expected or host in acks:
+                    continue
+                ack["elapsed"] = time.monotonic() - t0
+                self.metrics.observe("etap_beacon_ack_seconds", ack["elapsed"])
+                acks[host] = ack
+        self.metrics.inc("etap_beacon_acks_total", len(acks), action=action)
+        self.metrics.inc("etap_beacon_missed_total", len(expected) - len(acks), action=action)
+        return acks
+
+    def _packets(self, msg, targets):
+        # Hedefler, paket PACKET_LIMIT baytı ve CHUNK hedefi aşmayacak şekilde bölünür
+        base = len(pack(self.key, dict(msg, targets=[])))
+        chunks, chunk, size = [], [], base
+        for ip in targets:
+            # "ip", -> tırnaklar ve virgül
+            if chunk and (size + len(ip) + 3 > PACKET_LIMIT or len(chunk) >= CHUNK):
+                chunks.append(chunk)
+                chunk, size = [], base
+            chunk.append(ip)
+            size += len(ip) + 3
+        chunks.append(chunk)
+        return [pack(self.key, dict(msg, targets=chunk)) for chunk in chunks]
+
+    def _transmit(self, sock, packets):
+        for data in packets:
+            sock.sendto(data, (self.group, self.port))
+        self.metrics.inc("etap_beacon_packets_total", len(packets))
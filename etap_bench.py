@@ -0,0 +1,328 @@
+"""Benzetilmiş tahta filosu üzerinde tarama, elle işlem ve zil dalgası ölçümü.
+
+Her tahta, localhost'ta kendi portunu dinleyen bir paramiko SSH sunucusudur
+(ayrı bir süreçte); dbus-send / loginctl komutlarını gecikme, hata oranı ve
+kimlik doğrulama gecikmesiyle taklit eder. Tahtalar "127.0.0.1:port"
+adresleriyle hedeflenir.
+
+    python3 etap_bench.py --boards 50 500 5000 --latency 0.02 --fail-rate 0.01
+    python3 etap_bench.py --boards 500 --save temel.json
+    python3 etap_bench.py --boards 500 --baseline temel.json   # p95 gerilemesinde çıkış kodu 1
+    python3 etap_bench.py --boards 500 --startup 10   # panelin soğuk açılışı (pencere / hazır)
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import selectors
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import paramiko
+
+from etap_data import DataManager
+from etap_metrics import METRICS
+from etap_scanner import NetworkScanner
+from etap_service import EtapService
+from etap_state import BoardInventory
+
+USER = "etapadmin"
+PASSWORD = "benzetici"
+
+
+class _FakeBoard(paramiko.ServerInterface):
+    def __init__(self, latency, fail_rate, auth_delay):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.auth_delay = auth_delay
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        time.sleep(self.auth_delay)
+        return paramiko.AUTH_SUCCESSFUL if (username, password) == (USER, PASSWORD) else paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == "session" else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self._exec, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+    def _exec(self, chan, cmd):
+        time.sleep(self.latency * random.uniform(0.5, 1.5))
+        if random.random() < self.fail_rate:
+            chan.sendall_stderr(b"Error org.freedesktop.DBus.Error.NoReply: Did not receive a reply\n")
+            chan.send_exit_status(1)
+        elif cmd.startswith(("dbus-send", "loginctl", "export DISPLAY")):
+            chan.send_exit_status(0)
+        else:
+            chan.sendall_stderr(f"sh: 1: {cmd.split()[0]}: not found\n".encode())
+            chan.send_exit_status(127)
+        # Kanalı istemci kapatır; erken kapatmak exec yanıtıyla yarışır
+
+
+def _raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def _serve(n, profile, host, conn):
+    _raise_fd_limit()
+    # Tarayıcının açıp hemen kapattığı bağlantılar banner hatası olarak loglanır
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+    key = paramiko.RSAKey.generate(2048)
+    sel = selectors.DefaultSelector()
+    ports = []
+    for _ in range(n):
+        s = socket.socket()
+        s.bind((host, 0))
+        s.listen(128)
+        s.setblocking(False)
+        sel.register(s, selectors.EVENT_READ)
+        ports.append(s.getsockname()[1])
+    conn.send(ports)
+
+    def handshake(client):
+        transport = paramiko.Transport(client)
+        transport.add_server_key(key)
+        try:
+            transport.start_server(server=_FakeBoard(*profile))
+        except (paramiko.SSHException, EOFError, OSError):
+            transport.close()
+
+    # Tüm dinleyiciler tek bir seçicide; her bağlantı kendi transport'unu alır
+    while True:
+        for k, _ in sel.select():
+            try:
+                client, _ = k.fileobj.accept()
+            except BlockingIOError:
+                continue
+            client.setblocking(True)
+            threading.Thread(target=handshake, args=(client,), daemon=True).start()
+
+
+class FakeFleet:
+    """n adet sahte tahtayı ayrı bir süreçte başlatır; addresses host:port listesidir."""
+
+    def __init__(self, n, latency=0.0, fail_rate=0.0, auth_delay=0.0, host="127.0.0.1"):
+        self.n = n
+        self.profile = (latency, fail_rate, auth_delay)
+        self.host = host
+        self.addresses = []
+        self._proc = None
+
+    def start(self):
+        parent, child = multiprocessing.Pipe()
+        self._proc = multiprocessing.Process(target=_serve, args=(self.n, self.profile, self.host, child), daemon=True)
+        self._proc.start()
+        self.addresses = [f"{self.host}:{port}" for port in parent.recv()]
+        return self
+
+    def stop(self):
+        if self._proc:
+            self._proc.terminate()
+            self._proc.join()
+            self._proc = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, round(q / 100 * (len(values) - 1)))]
+
+
+def _report(name, n, total, latencies, ok):
+    row = {
+        "n": n,
+        "total": total,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "ok": ok,
+    }
+    print(f"{name:<16} n={n:<5} toplam={total:7.2f}s  p50={row['p50'] * 1000:8.1f}ms  "
+          f"p95={row['p95'] * 1000:8.1f}ms  p99={row['p99'] * 1000:8.1f}ms  başarılı={ok}/{n}", flush=True)
+    return row
+
+
+def bench_scan(addresses, concurrency):
+    # Gecikme: tarama başlangıcından tahtanın bulunmasına kadar geçen süre
+    seen = []
+    t0 = time.monotonic()
+    found = NetworkScanner(concurrency=concurrency).scan(addresses, on_found=lambda host: seen.append(time.monotonic() - t0))
+    return _report("tarama", len(addresses), time.monotonic() - t0, seen, len(found))
+
+
+def bench_manage(service, addresses, action, name):
+    t0 = time.monotonic()
+    results, _ = service.apply(addresses, action, force=True)
+    return _report(name, len(addresses), time.monotonic() - t0, [r.elapsed for r in results], sum(r.ok for r in results))
+
+
+def bench_wave(service, addresses, action):
+    t0 = time.monotonic()
+    results = service.run_wave(addresses, action)
+    return _report("zil dalgası", len(addresses), time.monotonic() - t0, [r.elapsed for r in results], sum(r.ok for r in results))
+
+
+def run(sizes, latency, fail_rate, auth_delay, workers, concurrency):
+    rows = {}
+    for n in sizes:
+        print(f"--- {n} tahta (gecikme {latency * 1000:.0f}ms, hata %{fail_rate * 100:.1f}, kimlik {auth_delay * 1000:.0f}ms)")
+        METRICS.reset()
+        with FakeFleet(n, latency, fail_rate, auth_delay) as fleet:
+            # Durum dosyaları geçici klasöre yazılır
+            os.chdir(tempfile.mkdtemp(prefix="etap_bench_"))
+            service = EtapService(get_targets=lambda: fleet.addresses, get_credentials=lambda: (USER, PASSWORD))
+            service.fanout.workers = workers
+            # Günlük, izleme ve havuz iş parçacıkları sonraki boyutun ölçümüne taşmasın
+            try:
+                rows[f"tarama@{n}"] = bench_scan(fleet.addresses, concurrency)
+                # İlk işlem bağlantı + anahtar değişimi + parola, sonrakiler havuzdan
+                rows[f"elle_soguk@{n}"] = bench_manage(service, fleet.addresses, "lock", "elle (soğuk)")
+                rows[f"elle_sicak@{n}"] = bench_manage(service, fleet.addresses, "unlock", "elle (sıcak)")
+                rows[f"zil@{n}"] = bench_wave(service, fleet.addresses, "lock")
+            finally:
+                service.stop()
+        # Yavaşlığın hangi aşamada olduğu: bağlantı, anahtar değişimi, parola, komut
+        for h in METRICS.snapshot()["histograms"]:
+            if h["name"] == "etap_ssh_phase_seconds":
+                print(f"  aşama {h['labels']['phase']:<8} p50={h['p50'] * 1000:8.1f}ms  p95={h['p95'] * 1000:8.1f}ms  ({h['count']})")
+    return rows
+
+
+# Ayrı bir Python sürecinde panel açılır; süreler süreç başlatılmadan önce
+# alınan ETAP_BENCH_T0 anına göre ölçülür (yorumlayıcı ve içe aktarmalar dahil)
+_STARTUP_PROBE = """
+import json, os, sys, time
+sys.path.insert(0, os.environ["ETAP_BENCH_REPO"])
+from PyQt6.QtCore import QEvent, QObject
+from PyQt6.QtWidgets import QApplication
+t0 = float(os.environ["ETAP_BENCH_T0"])
+app = QApplication(sys.argv[:1])
+import etap_panel_final
+marks = {}
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and "window" not in marks:
+            marks["window"] = time.time() - t0
+        return False
+
+def ready():
+    marks["ready"] = time.time() - t0
+    print(json.dumps(marks), flush=True)
+    app.quit()
+
+win = etap_panel_final.EtapKilitPaneli()
+probe = FirstPaint()
+win.installEventFilter(probe)
+win.ready_signal.connect(ready)
+win.show()
+try:
+    app.exec()
+finally:
+    win.service.stop()
+"""
+
+
+def bench_startup(n, runs):
+    # İlk pencere: panelin ilk çizimi; hazır: kayıtlı tahtalar listede ve
+    # servis başlatılmış (ready_signal). Her ölçüm soğuk bir süreçtir.
+    repo = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(tempfile.mkdtemp(prefix="etap_bench_"))
+    for name in ("program.json", "school_logo.png"):
+        if os.path.exists(os.path.join(repo, name)):
+            shutil.copy(os.path.join(repo, name), name)
+    # Belgeleme aralığı (192.0.2.0/24 ...): canlılık yoklaması kimseye ulaşmaz
+    BoardInventory().replace([f"192.0.{2 + i // 250}.{i % 250 + 1}" for i in range(n)])
+    DataManager.flush()
+    env = dict(os.environ, ETAP_BENCH_REPO=repo)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    window, ready = [], []
+    for _ in range(runs):
+        env["ETAP_BENCH_T0"] = repr(time.time())
+        out = subprocess.run([sys.executable, "-c", _STARTUP_PROBE], env=env, capture_output=True, text=True, timeout=60)
+        lines = [line for line in out.stdout.splitlines() if line.startswith("{")]
+        if not lines:
+            print(f"  açılış ölçümü başarısız: {out.stderr.strip().splitlines()[-1:]}")
+            continue
+        marks = json.loads(lines[-1])
+        window.append(marks["window"])
+        ready.append(marks["ready"])
+    return {
+        f"acilis_pencere@{n}": _report("ilk pencere", runs, sum(window), window, len(window)),
+        f"acilis_hazir@{n}": _report("hazır", runs, sum(ready), ready, len(ready)),
+    }
+
+
+def compare(rows, baseline, tolerance):
+    # p95 temel ölçümden tolerance oranından fazla kötüleştiyse gerileme sayılır
+    regressions = []
+    for key, row in rows.items():
+        base = baseline.get(key)
+        if base and base["p95"] > 0 and row["p95"] > base["p95"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {base['p95'] * 1000:.1f}ms -> {row['p95'] * 1000:.1f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ETAP kilit paneli performans ölçümü (benzetilmiş tahtalar)")
+    parser.add_argument("--boards", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--latency", type=float, default=0.02, help="komut gecikmesi (sn)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="komut hata oranı (0-1)")
+    parser.add_argument("--auth-delay", type=float, default=0.0, help="parola doğrulama gecikmesi (sn)")
+    parser.add_argument("--workers", type=int, default=32, help="SSH işçi sayısı (manage_workers)")
+    parser.add_argument("--concurrency", type=int, default=256, help="tarama eşzamanlılığı (scan_concurrency)")
+    parser.add_argument("--save", help="sonuçları JSON olarak kaydet")
+    parser.add_argument("--baseline", help="karşılaştırılacak önceki JSON sonuçları")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--startup", type=int, metavar="N", help="yalnızca panelin açılışını N kez ölç (--boards: kayıtlı tahta sayısı)")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    if args.startup:
+        rows = {}
+        for n in args.boards:
+            print(f"--- panel açılışı, {n} kayıtlı tahta ({args.startup} ölçüm)")
+            rows.update(bench_startup(n, args.startup))
+    else:
+        hard = _raise_fd_limit()
+        # Her tahta için panel ve sahte sunucu tarafında birer soket gerekir
+        if hard < max(args.boards) * 2 + 256:
+            print(f"Uyarı: dosya tanıtıcı sınırı ({hard}) {max(args.boards)} tahta için düşük olabilir.")
+        rows = run(args.boards, args.latency, args.fail_rate, args.auth_delay, args.workers, args.concurrency)
+    os.chdir(cwd)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=4)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(rows, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"GERİLEME {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import grp
+import json
+import os
+import pwd
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import traceback
+from dataclasses import asdict
+from datetime import datetime
+
+from etap_data import DataManager
+from etap_metrics import METRICS
+from etap_scanner import check_address
+from etap_ssh import summarize
+from etap_state import BOARD_FIELDS
+
+SOCKET_FILE = "etap_kontrol.sock"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # Her satır bir JSON istek; yanıtlar da satır satır JSON olarak akar
+
+    def handle(self):
+        user = self.peer_user()
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            # Hatalı istek bağlantıyı yanıtsız bırakmaz: her istek "done" ile biter
+            try:
+                req = json.loads(line)
+                if not isinstance(req, dict):
+                    raise ValueError("istek bir JSON nesnesi olmalı")
+                self.server.control.handle(req, self.send, user)
+                continue
+            except ConnectionError:
+                # İstemci bağlantıyı kapattı
+                return
+            except KeyError as e:
+                error = f"eksik alan: {e.args[0]}"
+            except ValueError as e:
+                error = str(e)
+            except Exception as e:
+                traceback.print_exc()
+                error = f"{type(e).__name__}: {e}"
+            try:
+                self.send({"error": error, "done": True})
+            except OSError:
+                return
+
+    def peer_user(self):
+        # İşlem günlüğüne yazılmak üzere bağlanan sürecin kullanıcısı
+        try:
+            _, uid, _ = struct.unpack("3i", self.request.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")))
+            return pwd.getpwuid(uid).pw_name
+        except (OSError, KeyError):
+            return "?"
+
+    def send(self, msg):
+        self.wfile.write(json.dumps(msg, ensure_ascii=False).encode() + b"\n")
+        self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _ip_list(req, key="ips"):
+    ips = req[key]
+    if not isinstance(ips, list) or not all(isinstance(ip, str) for ip in ips):
+        raise ValueError(f"{key} bir IP listesi olmalı")
+    return [check_address(ip) for ip in ips]
+
+
+def _ip(req, key="ip"):
+    if not isinstance(req[key], str):
+        raise ValueError(f"{key} bir IP adresi olmalı")
+    return check_address(req[key])
+
+
+class ControlServer:
+    """Servisin yerel denetim arayüzü (Unix soketi, satır başına bir JSON).
+
+    İstekler:
+      {"cmd": "lock"|"unlock", "ips": [...] | "group": "ad", "force": false, "source": "panel"}
+          Her tahtanın sonucu tamamlandıkça {"ip", "status", "error", "elapsed"}
+          olarak akar; en sonda {"done": true, "summary", "skipped"} gelir.
+      {"cmd": "history", "ip": "...", "since": "2026-10-18", "until": ...}
+          Tahtanın işlem günlüğü kayıtları (since verilmezse bugün)
+      {"cmd": "state"}   Tahta durum tablosu, canlılık ve yeniden deneme kuyruğu
+      {"cmd": "health"}  Yalnızca canlılık durumları (panelin düzenli yoklaması)
+      {"cmd": "boards"}  Kayıtlı tahtalar
+      {"cmd": "groups"}  Etiket/konum grupları (tahta sayısıyla) ve ayarlar.json grupları
+      {"cmd": "tag", "ips": [...], "tag": "fen", "remove": false}
+      {"cmd": "describe", "ip": "...", "name": ..., "room": ..., "floor": ..., "tags": [...]}
+          Tahta kaydını günceller (tahtalar.json servis tarafından yazılır)
+      {"cmd": "seen", "ips": [...], "replace": false}
+          Panelin taramasında bulunan tahtalar (replace: tam tarama)
+      {"cmd": "clear"}   Tahta listesini ve durum tablosunu temizler
+      {"cmd": "metrics"} Aşama süreleri, sayaçlar ve histogramlar
+      {"cmd": "reload"}  ayarlar.json / program.json yeniden okunur
+      {"cmd": "sync", "full": false}
+          Zil programını güncel olmayan tahta ajanlarına gönderir
+      {"cmd": "sync_status", "verify": false}
+          Programı güncel / eski / bilinmeyen tahtalar (verify: ajanlara sorulur)
+
+    Panel, betikler ve diğer araçlar aynı SSH havuzunu ve işçi havuzunu paylaşır.
+    Soket 0660 izinlidir; group verilirse (ayarlar.json "control_group") o
+    gruba, verilmezse servis sürecinin grubuna (etap-kilit.service: Group=) aittir.
+    """
+
+    def __init__(self, service, path=SOCKET_FILE, group=None):
+        self.service = service
+        self.path = path
+        self.group = group
+        self._server = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._server = _Server(self.path, _Handler)
+        self._server.control = self
+        # Panel servisle aynı grupta çalışan normal kullanıcıdır
+        os.chmod(self.path, 0o660)
+        if self.group:
+            os.chown(self.path, -1, grp.getgrnam(self.group).gr_gid)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            os.remove(self.path)
+            self._server = None
+
+    def handle(self, req, send, user="?"):
+        cmd = req["cmd"]
+        if cmd in ("lock", "unlock"):
+            ips = self.service.group(req["group"]) if "group" in req else _ip_list(req)
+            source = f"{req.get('source', 'api')}:{user}"
+            results, skipped = self.service.apply(ips, cmd, force=req.get("force", False), on_result=lambda res: send(asdict(res)), source=source)
+            send({"done": True, "summary": summarize(results), "skipped": skipped})
+        elif cmd == "state":
+            send({
+                "done": True,
+                "states": self.service.states.snapshot(),
+                "health": self.service.monitor.snapshot(),
+                "retry": self.service.retry.pending(),
+            })
+        elif cmd == "health":
+            send({"done": True, "health": self.service.monitor.snapshot()})
+        elif cmd == "history":
+            since = req.get("since") or datetime.now().date().isoformat()
+            send({"done": True, "records": self.service.journal.query(req["ip"], since, req.get("until"))})
+        elif cmd == "metrics":
+            send({"done": True, "metrics": METRICS.snapshot()})
+        elif cmd == "boards":
+            send({"done": True, "boards": self.service.inventory.ips()})
+        elif cmd == "groups":
+            send({"done": True, "groups": self.service.inventory.labels(), "ranges": sorted(self.service.config.get("groups", {}))})
+        elif cmd in ("tag", "describe"):
+            if cmd == "tag":
+                self.service.inventory.tag(_ip_list(req), req["tag"], remove=req.get("remove", False))
+            else:
+                self.service.inventory.describe(_ip(req), **{k: v for k, v in req.items() if k in BOARD_FIELDS})
+            # İstemci tahtalar.json'u hemen yeniden okuyabilsin
+            DataManager.flush()
+            send({"done": True})
+        elif cmd in ("seen", "clear"):
+            if cmd == "seen":
+                self.service.boards_seen(_ip_list(req), replace=req.get("replace", False))
+            else:
+                self.service.clear_boards()
+            DataManager.flush()
+            send({"done": True, "boards": len(self.service.inventory)})
+        elif cmd == "reload":
+            send({"done": True, "errors": self.service.reload()})
+        elif cmd == "sync":
+            send({"done": True, **self.service.sync_schedule(full=req.get("full", False))})
+        elif cmd == "sync_status":
+            report = self.service.verify_sync() if req.get("verify") else self.service.sync_report()
+            send({"done": True, **report})
+        else:
+            raise ValueError(f"bilinmeyen komut: {cmd}")
+
+
+class ControlClient:
+    def __init__(self, path=SOCKET_FILE, timeout=None):
+        self.path = path
+        self.timeout = timeout
+
+    def available(self):
+        return os.path.exists(self.path)
+
+    def reachable(self):
+        # Soket var ve bağlanma izni var mı (panel kullanıcısı servis grubunda mı)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout or 2)
+                sock.connect(self.path)
+            return True
+        except OSError:
+            return False
+
+    def request(self, req):
+        # Yanıt satırlarını geldikçe döndürür; son satırda "done" (hata varsa
+        # "error") bulunur. Tahta sonuçlarının kendi "error" alanı vardır.
+        # Akış "done" gelmeden biterse RuntimeError.
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            sock.sendall(json.dumps(req, ensure_ascii=False).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                for line in f:
+                    msg = json.loads(line)
+                    yield msg
+                    if msg.get("done"):
+                        return
+        raise RuntimeError("servis yanıtı tamamlanmadan bağlantı kapandı")
+
+    def call(self, req):
+        # Akışı beklemeden yalnızca son yanıtı döndürür
+        msg = {}
+        for msg in self.request(req):
+            pass
+        if msg.get("error"):
+            raise RuntimeError(msg["error"])
+        return msg
+
+
+def main():
+    # Örnek: etap_control.py lock 10.46.197.21 10.46.197.22
+    #        etap_control.py unlock @1.kat
+    #        etap_control.py state
+    #        etap_control.py history 10.46.197.21 [2026-10-01]
+    #        etap_control.py sync_status --verify
+    #        etap_control.py tag fen 10.46.197.21 10.46.197.22
+    usage = "Kullanım: etap_control.py lock|unlock <ip>... | @grup  |  history <ip> [tarih]  |  state | boards | metrics | reload  |  sync [--full] | sync_status [--verify]  |  groups | tag|untag <etiket> <ip>..."
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(2)
+    cmd, args = sys.argv[1], sys.argv[2:]
+    # Eksik argüman: istek gönderilmeden kullanım gösterilir
+    if (cmd in ("lock", "unlock", "history") and not args) or (cmd in ("tag", "untag") and len(args) < 2):
+        print(usage, file=sys.stderr)
+        sys.exit(2)
+    req = {"cmd": cmd}
+    if cmd in ("lock", "unlock"):
+        if len(args) == 1 and args[0].startswith("@"):
+            req["group"] = args[0][1:]
+        else:
+            req["ips"] = args
+    elif cmd == "history":
+        req["ip"] = args[0]
+        if len(args) > 1:
+            req["since"] = args[1]
+    elif cmd in ("tag", "untag"):
+        req = {"cmd": "tag", "tag": args[0], "ips": args[1:], "remove": cmd == "untag"}
+    elif cmd == "sync":
+        req["full"] = "--full" in args
+    elif cmd == "sync_status":
+        req["verify"] = "--verify" in args
+    for msg in ControlClient().request(req):
+        print(json.dumps(msg, ensure_ascii=False))
+        if msg.get("done") and msg.get("error"):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class DataManager:
+    """JSON dosyalarının kalıcı kaydı.
+
+    save_json geçici dosyaya yazar, fsync eder ve os.replace ile yerine koyar;
+    yazma yarıda kesilse bile eski dosya sağlam kalır. İçerik son yazılanla
+    aynıysa diske dokunulmaz. save_later sık değişen veriler (tahta durumları)
+    için kaydı arka plan yazıcısına bırakır: delay saniye içinde gelen kayıtlar
+    birleştirilir, yalnızca en sonuncusu yazılır (en geç max_delay sonra).
+
+    Her kayıt dosya başına artan bir sıra numarası alır ve aynı dosyaya
+    yazmalar sırayla yapılır: save_json bekleyen ertelenmiş kaydı geçersiz
+    kılar, geç kalan eski bir kayıt yenisinin üzerine yazılmaz.
+    """
+
+    SETTINGS_FILE = "ayarlar.json"
+    SCHEDULE_FILE = "program.json"
+    IPS_FILE = "tahtalar.json"
+    STATE_FILE = "tahta_durum.json"
+    JOURNAL_FILE = "islem_gunlugu.jsonl"
+    # Tahtalara en son gönderilen program (fark göndermek için taban)
+    SYNCED_FILE = "tahta_programi.json"
+
+    _lock = threading.Condition()
+    _digests = {}
+    # mutlak yol -> [metin, sıra no, yazılacağı an, en geç yazılacağı an]
+    _pending = {}
+    _writer = None
+    # mutlak yol -> son verilen sıra no / diske yazılan sıra no / yazma kilidi
+    _generation = {}
+    _written = {}
+    _file_locks = {}
+
+    @staticmethod
+    def save_json(file, data):
+        text = DataManager._dump(data)
+        path = os.path.abspath(file)
+        with DataManager._lock:
+            # Bekleyen ertelenmiş kayıt bu kayıttan eskidir
+            DataManager._pending.pop(path, None)
+            gen = DataManager._next_generation(path)
+        return DataManager._write(path, text, gen)
+
+    @staticmethod
+    def save_later(file, data, delay=0.5, max_delay=5.0):
+        # Anlık görüntü çağıranın iş parçacığında alınır, yazma arka planda
+        text = DataManager._dump(data)
+        path = os.path.abspath(file)
+        now = time.monotonic()
+        with DataManager._lock:
+            gen = DataManager._next_generation(path)
+            entry = DataManager._pending.get(path)
+            if entry is None:
+                DataManager._pending[path] = [text, gen, now + delay, now + max_delay]
+            else:
+                entry[0:2] = [text, gen]
+                entry[2] = min(now + delay, entry[3])
+            if DataManager._writer is None:
+                DataManager._writer = threading.Thread(target=DataManager._run, daemon=True)
+                DataManager._writer.start()
+            DataManager._lock.notify()
+
+    @staticmethod
+    def flush():
+        # Bekleyen tüm kayıtları hemen yaz (kapanışta)
+        with DataManager._lock:
+            pending, DataManager._pending = DataManager._pending, {}
+        for path, (text, gen, _, _) in pending.items():
+            DataManager._write(path, text, gen)
+
+    @staticmethod
+    def load_json(file, default):
+        if os.path.exists(file):
+            try:
+                with open(file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                # Bozuk dosya bir sonraki kayıtta sessizce ezilmesin
+                print(f"{file} okunamadı ({e}); {file}.bozuk olarak saklandı, varsayılan kullanılıyor.")
+                try:
+                    os.replace(file, f"{file}.bozuk")
+                except OSError:
+                    pass
+                return default
+        return default
+
+    @staticmethod
+    def _dump(data):
+        return json.dumps(data, ensure_ascii=False, indent=4)
+
+    @staticmethod
+    def _next_generation(path):
+        # _lock tutulurken çağrılır
+        gen = DataManager._generation[path] = DataManager._generation.get(path, 0) + 1
+        if path not in DataManager._file_locks:
+            DataManager._file_locks[path] = threading.Lock()
+        return gen
+
+    @staticmethod
+    def _write(path, text, gen):
+        with DataManager._file_locks[path]:
+            # Daha yeni bir kayıt yazıldıysa bu kayıt atılır
+            if gen < DataManager._written.get(path, 0):
+                return False
+            changed = DataManager._write_file(path, text)
+            DataManager._written[path] = gen
+            return changed
+
+    @staticmethod
+    def _write_file(path, text):
+        data = text.encode("utf-8")
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        # Dosyayı başka bir süreç (servis/panel) değiştirdiyse yine yazılır
+        try:
+            st = os.stat(path)
+            if DataManager._digests.get(path) == (digest, st.st_mtime_ns, st.st_size):
+                return False
+        except OSError:
+            pass
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        # Yeniden adlandırmanın kalıcı olması için klasör de eşitlenir
+        try:
+            fd = os.open(os.path.dirname(path), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+        st = os.stat(path)
+        DataManager._digests[path] = (digest, st.st_mtime_ns, st.st_size)
+        return True
+
+    @staticmethod
+    def _run():
+        lock = DataManager._lock
+        while True:
+            with lock:
+                while not DataManager._pending:
+                    lock.wait()
+                now = time.monotonic()
+                next_due = min(entry[2] for entry in DataManager._pending.values())
+                if next_due > now:
+                    lock.wait(next_due - now)
+                    continue
+                due = {p: entry[:2] for p, entry in DataManager._pending.items() if entry[2] <= now}
+                for p in due:
+                    del DataManager._pending[p]
+            for path, (text, gen) in due.items():
+                try:
+                    DataManager._write(path, text, gen)
+                except OSError as e:
+                    print(f"{path} kaydedilemedi: {e}")
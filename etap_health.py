@@ -0,0 +1,117 @@
+import threading
+import time
+
+from etap_scanner import NetworkScanner
+from etap_ssh import AUTH_FAILED, EXIT_FAILED, OK, REFUSED, TIMEOUT
+
+ONLINE = "online"
+OFFLINE = "offline"
+UNKNOWN = "unknown"
+
+STATUS_LABELS = {ONLINE: "çevrimiçi", OFFLINE: "çevrimdışı", UNKNOWN: "bilinmiyor"}
+
+
+class LivenessMonitor(threading.Thread):
+    """Tahtaları port 22 yoklamasıyla arka planda izler.
+
+    Çevrimiçi tahtalar her interval saniyede bir, çevrimdışı olanlar üstel
+    artan aralıklarla (min_backoff .. max_backoff) yoklanır. Durum değişiklikleri
+    on_change([(ip, durum), ...]) ile toplu bildirilir. Bekleyen işi olan
+    tahtalar expedite() ile işaretlenir; bunlar urgent_backoff'tan seyrek
+    yoklanmaz, geri geldiklerinde birkaç saniye içinde fark edilir.
+    """
+
+    def __init__(self, get_targets, on_change=None, interval=30, min_backoff=5, max_backoff=120, urgent_backoff=5, scanner=None):
+        super().__init__(daemon=True)
+        self.get_targets = get_targets
+        self.on_change = on_change
+        self.interval = interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.urgent_backoff = urgent_backoff
+        self.scanner = scanner or NetworkScanner(timeout=1.0, concurrency=128)
+        self._lock = threading.Lock()
+        # ip -> [durum, sonraki yoklama (monotonic), geri çekilme süresi]
+        self._boards = {}
+        self._urgent = set()
+        self._halt = threading.Event()
+
+    def status(self, ip):
+        with self._lock:
+            st = self._boards.get(ip)
+            return st[0] if st else UNKNOWN
+
+    def is_down(self, ip):
+        return self.status(ip) == OFFLINE
+
+    def snapshot(self):
+        with self._lock:
+            return {ip: st[0] for ip, st in self._boards.items()}
+
+    def expedite(self, ips):
+        now = time.monotonic()
+        with self._lock:
+            for ip in ips:
+                self._urgent.add(ip)
+                st = self._boards.get(ip)
+                if st and st[0] == OFFLINE:
+                    st[2] = min(st[2], self.urgent_backoff)
+                    st[1] = min(st[1], now + st[2])
+
+    def relax(self, ips):
+        with self._lock:
+            self._urgent.difference_update(ips)
+
+    def observe(self, results):
+        # SSH sonuçları da canlılık bilgisidir; ayrıca yoklama gerekmez
+        changes = []
+        with self._lock:
+            for res in results:
+                if res.ip not in self._boards:
+                    continue
+                # Kimlik ya da komut hatası da tahtanın yanıt verdiğini gösterir
+                if res.status in (OK, AUTH_FAILED, EXIT_FAILED):
+                    changes.append(self._update(res.ip, True))
+                elif res.status in (TIMEOUT, REFUSED):
+                    changes.append(self._update(res.ip, False))
+        self._notify(changes)
+
+    def run(self):
+        while not self._halt.is_set():
+            targets = list(self.get_targets())
+            now = time.monotonic()
+            with self._lock:
+                self._boards = {ip: self._boards.get(ip) or [UNKNOWN, now, self.min_backoff] for ip in targets}
+                due = [ip for ip, st in self._boards.items() if st[1] <= now]
+            if due:
+                alive = set(self.scanner.scan(due))
+                with self._lock:
+                    changes = [self._update(ip, ip in alive) for ip in due if ip in self._boards]
+                self._notify(changes)
+            with self._lock:
+                next_due = min((st[1] for st in self._boards.values()), default=now + self.interval)
+            # Yeni eklenen tahtalar en geç birkaç saniyede yoklansın
+            self._halt.wait(min(max(0.5, next_due - time.monotonic()), 5))
+
+    def _update(self, ip, up):
+        st = self._boards[ip]
+        old = st[0]
+        now = time.monotonic()
+        if up:
+            st[0], st[2] = ONLINE, self.min_backoff
+            st[1] = now + self.interval
+        else:
+            # Yeni düşen tahta kısa sürede tekrar denenir, sonra aralık katlanır
+            cap = self.urgent_backoff if ip in self._urgent else self.max_backoff
+            st[2] = self.min_backoff if old != OFFLINE else min(st[2] * 2, cap)
+            st[0] = OFFLINE
+            st[1] = now + st[2]
+        return (ip, st[0]) if st[0] != old else None
+
+    def _notify(self, changes):
+        changes = [c for c in changes if c]
+        if changes and self.on_change:
+            self.on_change(changes)
+
+    def stop(self):
+        self._halt.set()
@@ -0,0 +1,145 @@
+import glob
+import json
+import os
+import queue
+import threading
+from datetime import date, datetime
+
+from etap_data import DataManager
+
+
+class ActionJournal:
+    """Tahta başına, komut başına bir kayıt tutan yalnızca-ekleme işlem günlüğü.
+
+    Kayıtlar satır başına bir JSON'dur ve arka plandaki yazıcı tarafından
+    toplu olarak (tek write + flush) diske eklenir; 500 tahtalık bir dalga 500
+    ayrı yazma yapmaz. Dosya gün değişince ya da max_bytes aşılınca
+    "günlük.jsonl.YYYYmmdd-HHMMSS" adıyla döndürülür, en fazla keep eski dosya
+    saklanır. Bugünün kayıtları IP'ye göre bellekte de tutulur: today(ip) diske
+    inmez.
+    """
+
+    def __init__(self, path=DataManager.JOURNAL_FILE, max_bytes=5 * 1024 * 1024, keep=30, flush_interval=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._today = {}
+        self._day = date.today()
+        self._load_today()
+        self._halt = threading.Event()
+        self._writer = threading.Thread(target=self._run, daemon=True)
+        self._writer.start()
+
+    def log(self, results, action, source):
+        now = datetime.now().isoformat(timespec="seconds")
+        records = [
+            {
+                "time": now, "ip": r.ip, "action": action, "source": source, "status": r.status,
+                "exit_code": r.exit_code, "error": r.error, "elapsed": round(r.elapsed, 3),
+            }
+            for r in results
+        ]
+        with self._lock:
+            self._roll_day()
+            for rec in records:
+                self._today.setdefault(rec["ip"], []).append(rec)
+        for rec in records:
+            self._queue.put(rec)
+
+    def today(self, ip):
+        with self._lock:
+            self._roll_day()
+            return list(self._today.get(ip, []))
+
+    def query(self, ip, since=None, until=None):
+        # since/until: ISO zaman dizgisi ("2026-10-18" ya da "2026-10-18T08:00")
+        if since and since >= date.today().isoformat() and not until:
+            return [r for r in self.today(ip) if r["time"] >= since]
+        self.flush()
+        out = []
+        for path in self._files(since):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if f'"{ip}"' not in line:
+                            continue
+                        rec = json.loads(line)
+                        if rec["ip"] == ip and (not since or rec["time"] >= since) and (not until or rec["time"] < until):
+                            out.append(rec)
+            except (OSError, ValueError):
+                continue
+        return out
+
+    def flush(self):
+        # Kuyruktaki kayıtlar diske yazılana kadar bekler
+        self._queue.join()
+
+    def close(self):
+        self._halt.set()
+        self._writer.join()
+
+    def _files(self, since):
+        # Döndürülmüş dosyanın adındaki zaman, içindeki en son kaydın üst sınırıdır
+        rotated = sorted(glob.glob(f"{glob.escape(self.path)}.*"))
+        stamp = since.replace("-", "").replace(":", "").replace("T", "-") if since else ""
+        return [p for p in rotated if p.rsplit(".", 1)[-1] >= stamp] + [self.path]
+
+    def _roll_day(self):
+        if date.today() != self._day:
+            self._day = date.today()
+            self._today.clear()
+
+    def _load_today(self):
+        # Gün içinde boyut nedeniyle döndürülmüş dosyalar da okunur
+        prefix = date.today().isoformat()
+        for path in self._files(prefix):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            rec = json.loads(line)
+                        except ValueError:
+                            continue
+                        if rec.get("time", "").startswith(prefix):
+                            self._today.setdefault(rec["ip"], []).append(rec)
+            except OSError:
+                continue
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                try:
+                    self._write(batch)
+                except OSError as e:
+                    print(f"İşlem günlüğü yazılamadı: {e}")
+                for _ in batch:
+                    self._queue.task_done()
+            elif self._halt.is_set():
+                return
+
+    def _write(self, batch):
+        self._rotate()
+        data = "".join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in batch)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+    def _rotate(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        if st.st_size < self.max_bytes and date.fromtimestamp(st.st_mtime) == date.today():
+            return
+        os.replace(self.path, f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+        for old in sorted(glob.glob(f"{glob.escape(self.path)}.*"))[:-self.keep]:
+            os.remove(old)
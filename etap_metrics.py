@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Saniye cinsinden histogram sınırları (LAN'da bağlantı ms, komut yüzlerce ms)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Kova içinde doğrusal ara değer; son kova (+Inf) için en büyük sınır
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lo = self.buckets[i - 1] if i else 0.0
+                return lo + (self.buckets[i] - lo) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _fmt(name, labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Metrics:
+    """Sayaç, anlık değer (gauge) ve histogramlar; iş parçacığı güvenli.
+
+    Adlar Prometheus kuralına uyar (etap_..._total, etap_..._seconds).
+    Çıktı: to_prometheus() (node_exporter textfile), snapshot() (JSON).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def inc(self, name, n=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def add(self, name, delta, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _labels(labels))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - t0, **labels)
+
+    @contextmanager
+    def inflight(self, name, **labels):
+        self.add(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.add(name, -1, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "time": time.time(),
+                "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self._counters.items())],
+                "gauges": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self._gauges.items())],
+                "histograms": [
+                    {
+                        "name": n, "labels": dict(l), "count": h.count, "sum": h.sum,
+                        "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                    }
+                    for (n, l), h in sorted(self._histograms.items())
+                ],
+            }
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self._counters), ("gauge", self._gauges)):
+                typed = set()
+                for (name, labels), value in sorted(series.items()):
+                    if name not in typed:
+                        typed.add(name)
+                        lines.append(f"# TYPE {name} {kind}")
+                    lines.append(f"{_fmt(name, labels)} {value}")
+            typed = set()
+            for (name, labels), h in sorted(self._histograms.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} histogram")
+                total = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    total += n
+                    lines.append(f"{_fmt(name + '_bucket', labels, [('le', bound)])} {total}")
+                lines.append(f"{_fmt(name + '_bucket', labels, [('le', '+Inf')])} {h.count}")
+                lines.append(f"{_fmt(name + '_sum', labels)} {h.sum}")
+                lines.append(f"{_fmt(name + '_count', labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, prom_path=None, json_path=None):
+        if prom_path:
+            _write_atomic(prom_path, self.to_prometheus())
+        if json_path:
+            _write_atomic(json_path, json.dumps(self.snapshot(), ensure_ascii=False, indent=1))
+
+
+def _write_atomic(path, text):
+    # Yarım yazılmış dosya okunmasın diye geçici dosya + rename
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+# Süreç genelinde paylaşılan kayıt: tarayıcı, SSH havuzu ve FanOut buraya yazar
+METRICS = Metrics()
@@ -0,0 +1,358 @@
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Qt, QTime, QTimer
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QComboBox, QStyledItemDelegate, QTimeEdit
+
+from etap_health import OFFLINE, ONLINE, UNKNOWN, STATUS_LABELS as HEALTH_LABELS
+from etap_scanner import address_key
+from etap_schedule import CompiledSchedule
+from etap_state import board_labels
+
+# Sıralama için ham değer (IP sayısal, gecikme ms)
+SORT_ROLE = Qt.ItemDataRole.UserRole + 1
+
+LOCK_LABELS = {"lock": "🔒 Kilitli", "unlock": "🔓 Açık"}
+HEALTH_COLORS = {ONLINE: QColor("#27ae60"), OFFLINE: QColor("#c0392b"), UNKNOWN: QColor("#7f8c8d")}
+
+
+def _address_number(ip):
+    # Sayısal sıralama için tek tamsayı (Qt tuple karşılaştıramaz)
+    octets, port = address_key(ip)
+    n = 0
+    for part in octets:
+        n = n * 256 + part
+    return n * 65536 + port
+
+
+class BoardTableModel(QAbstractTableModel):
+    """Tahta tablosu: IP, ad, grup, çevrimiçi, kilit durumu, son gecikme.
+
+    Satır verisi önceden biçimlenmiş olarak tutulur, data() yalnızca okur.
+    update_health() / record() değişen satırları işaretler; dataChanged zamanlayıcıyla
+    (flush_ms) ardışık satır aralıkları halinde toplu yayınlanır, 5000 tahtalık
+    bir dalga 5000 ayrı yeniden çizim tetiklemez.
+    """
+
+    COLUMNS = ("IP", "Ad", "Grup", "Durum", "Kilit", "Gecikme")
+    IP, NAME, GROUP, HEALTH, LOCK, LATENCY = range(6)
+
+    def __init__(self, inventory, parent=None, flush_ms=150):
+        super().__init__(parent)
+        self.inventory = inventory
+        self._ips = []
+        self._row = {}
+        self._info = {}
+        self._dirty = set()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(flush_ms)
+        self._timer.timeout.connect(self.flush)
+
+    # --- Qt arayüzü ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ips)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        info = self._info[self._ips[index.row()]]
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return info["text"][col]
+        if role == SORT_ROLE:
+            return info["sort"][col]
+        if role == Qt.ItemDataRole.ForegroundRole and col in (self.IP, self.HEALTH):
+            return HEALTH_COLORS[info["status"]]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return info["error"] or None
+        return None
+
+    # --- Tahta listesi ---
+    def ips(self):
+        return list(self._ips)
+
+    def ip(self, row):
+        return self._ips[row]
+
+    def row(self, ip):
+        return self._row.get(ip)
+
+    def set_boards(self, ips, states=None):
+        self.beginResetModel()
+        self._ips = list(dict.fromkeys(ips))
+        self._row = {ip: i for i, ip in enumerate(self._ips)}
+        self._info = {ip: self._make(ip, (states or {}).get(ip, {})) for ip in self._ips}
+        self._dirty.clear()
+        self.endResetModel()
+
+    def add(self, ips, states=None):
+        new = [ip for ip in dict.fromkeys(ips) if ip not in self._row]
+        if not new:
+            return []
+        first = len(self._ips)
+        self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+        for ip in new:
+            self._row[ip] = len(self._ips)
+            self._ips.append(ip)
+            self._info[ip] = self._make(ip, (states or {}).get(ip, {}))
+        self.endInsertRows()
+        return new
+
+    def clear(self):
+        self.set_boards([])
+
+    # --- Canlı güncellemeler ---
+    def update_health(self, changes):
+        for ip, status in changes:
+            info = self._info.get(ip)
+            if info:
+                info["status"] = status
+                self._set(info, self.HEALTH, HEALTH_LABELS[status], status)
+                self._touch(ip)
+
+    def record(self, results, action):
+        # Komut sonuçları: kilit durumu ve son gecikme
+        for res in results:
+            info = self._info.get(res.ip)
+            if not info:
+                continue
+            if res.ok:
+                self._set(info, self.LOCK, LOCK_LABELS[action], action)
+                info["error"] = ""
+            else:
+                self._set(info, self.LOCK, "⚠ Bilinmiyor", "")
+                info["error"] = f"{res.status}: {res.error}"
+            self._set(info, self.LATENCY, f"{res.elapsed * 1000:.0f} ms", res.elapsed * 1000)
+            self._touch(res.ip)
+
+    def refresh_registry(self):
+        # Ad / grup sütunları tahta kaydından yeniden okunur
+        for ip, info in self._info.items():
+            st = self.inventory.get(ip)
+            self._set(info, self.NAME, st.get("name", ""), st.get("name", ""))
+            group = ", ".join(sorted(board_labels(st)))
+            self._set(info, self.GROUP, group, group)
+        if self._ips:
+            self.dataChanged.emit(self.index(0, self.NAME), self.index(len(self._ips) - 1, self.GROUP))
+
+    def flush(self):
+        # İşaretli satırlar ardışık aralıklar halinde tek tek değil topluca bildirilir
+        rows = sorted(self._row[ip] for ip in self._dirty if ip in self._row)
+        self._dirty.clear()
+        last = len(self.COLUMNS) - 1
+        i = 0
+        while i < len(rows):
+            j = i
+            while j + 1 < len(rows) and rows[j + 1] == rows[j] + 1:
+                j += 1
+            self.dataChanged.emit(self.index(rows[i], 0), self.index(rows[j], last))
+            i = j + 1
+
+    def _touch(self, ip):
+        self._dirty.add(ip)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    @staticmethod
+    def _set(info, col, text, key):
+        info["text"][col] = text
+        info["sort"][col] = key
+
+    def _make(self, ip, state):
+        st = self.inventory.get(ip)
+        group = ", ".join(sorted(board_labels(st)))
+        lock = state.get("confirmed", "")
+        return {
+            "status": UNKNOWN,
+            "error": state.get("last_error", ""),
+            "text": [ip, st.get("name", ""), group, HEALTH_LABELS[UNKNOWN], LOCK_LABELS.get(lock, ""), ""],
+            "sort": [_address_number(ip), st.get("name", ""), group, UNKNOWN, lock, -1.0],
+        }
+
+
+class BoardFilterProxy(QSortFilterProxyModel):
+    """Tüm sütunlarda büyük/küçük harf duyarsız süzme ve ham değerle sıralama."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSortRole(SORT_ROLE)
+        self.setFilterKeyColumn(-1)
+        self.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+
+
+ACTION_LABELS = {"lock": "Kilitle (Tenefüs)", "unlock": "Aç (Ders)"}
+
+
+class ScheduleModel(QAbstractTableModel):
+    """Haftalık zil programı; tabloda seçili günün dilimleri gösterilir.
+
+    Tüm hafta modelde tutulur: gün değiştirmek yalnızca modeli sıfırlar,
+    kaydedilmemiş düzenlemeler kaybolmaz ve satır başına widget oluşmaz.
+    Her değişiklikte program CompiledSchedule ile derlenir; hatalı satırlar
+    kırmızı gösterilir, hata metni ipucundadır.
+    """
+
+    COLUMNS = ("Başlangıç", "Bitiş", "İşlem", "Grup (boş: tüm okul)")
+    START, END, ACTION, GROUP = range(4)
+    KEYS = ("start", "end", "action", "group")
+
+    def __init__(self, schedule, parent=None):
+        super().__init__(parent)
+        self._days = {day: [dict(s) for s in slots] for day, slots in schedule.items()}
+        self.day = next(iter(self._days), None)
+        self._errors = {}
+        self._validate()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._days.get(self.day, ()))
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        return super().flags(index) | Qt.ItemFlag.ItemIsEditable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        slot = self._days[self.day][index.row()]
+        value = slot.get(self.KEYS[index.column()], "")
+        if role == Qt.ItemDataRole.DisplayRole:
+            return ACTION_LABELS.get(value, value) if index.column() == self.ACTION else value
+        if role == Qt.ItemDataRole.EditRole:
+            return value
+        error = self._errors.get(index.row())
+        if error and role == Qt.ItemDataRole.BackgroundRole:
+            return QColor("#fadbd8")
+        if error and role == Qt.ItemDataRole.ToolTipRole:
+            return error
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.EditRole:
+            return False
+        slot = self._days[self.day][index.row()]
+        key = self.KEYS[index.column()]
+        value = str(value).strip()
+        if key == "group" and not value:
+            slot.pop("group", None)
+        else:
+            slot[key] = value
+        self.dataChanged.emit(index, index)
+        self._validate()
+        return True
+
+    def set_day(self, day):
+        self.beginResetModel()
+        self.day = day
+        self._days.setdefault(day, [])
+        self.endResetModel()
+        self._validate()
+
+    def set_slots(self, slots):
+        # Sihirbaz: seçili günün tüm dilimleri tek seferde değişir
+        self.beginResetModel()
+        self._days[self.day] = [dict(s) for s in slots]
+        self.endResetModel()
+        self._validate()
+
+    def add_slot(self, start="08:00", end="08:40", action="lock", group=""):
+        slots = self._days.setdefault(self.day, [])
+        self.beginInsertRows(QModelIndex(), len(slots), len(slots))
+        slots.append({"start": start, "end": end, "action": action, **({"group": group} if group else {})})
+        self.endInsertRows()
+        self._validate()
+
+    def remove_rows(self, rows):
+        for row in sorted(set(rows), reverse=True):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._days[self.day][row]
+            self.endRemoveRows()
+        self._validate()
+
+    def copy_to_week(self):
+        current = self._days.get(self.day, [])
+        for day in self._days:
+            if day != self.day:
+                self._days[day] = [dict(s) for s in current]
+        self._validate()
+
+    def schedule(self):
+        return {day: [dict(s) for s in slots] for day, slots in self._days.items()}
+
+    def _validate(self):
+        # Derleyicinin "Gün satır N: ..." hataları seçili günün satırlarına eşlenir
+        errors = CompiledSchedule.compile({self.day: self._days.get(self.day, [])}, strict=False).errors if self.day else []
+        prefix = f"{self.day} satır "
+        found = {}
+        for error in errors:
+            if error.startswith(prefix):
+                row, _, msg = error[len(prefix):].partition(": ")
+                if row.isdigit():
+                    found.setdefault(int(row) - 1, msg)
+        if found != self._errors:
+            self._errors = found
+            if self.rowCount():
+                self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, len(self.COLUMNS) - 1))
+
+    def errors(self):
+        return dict(self._errors)
+
+
+class TimeDelegate(QStyledItemDelegate):
+    # Saat hücresi: düzenleme sırasında QTimeEdit, diğer zamanlarda yalnızca metin
+
+    def createEditor(self, parent, option, index):
+        editor = QTimeEdit(parent)
+        editor.setDisplayFormat("HH:mm")
+        return editor
+
+    def setEditorData(self, editor, index):
+        # "08.50" gibi eski kayıtlar düzenlenince "08:50" olarak yazılır
+        time = QTime.fromString(index.data(Qt.ItemDataRole.EditRole).replace(".", ":"), "H:mm")
+        editor.setTime(time if time.isValid() else QTime(8, 0))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.time().toString("HH:mm"))
+
+
+class ActionDelegate(QStyledItemDelegate):
+    def createEditor(self, parent, option, index):
+        editor = QComboBox(parent)
+        for action, label in ACTION_LABELS.items():
+            editor.addItem(label, action)
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentIndex(max(0, editor.findData(index.data(Qt.ItemDataRole.EditRole))))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentData())
+
+
+class GroupDelegate(QStyledItemDelegate):
+    # Düzenlenebilir liste: bilinen gruplar önerilir, yeni ad da yazılabilir
+
+    def __init__(self, get_groups, parent=None):
+        super().__init__(parent)
+        self.get_groups = get_groups
+
+    def createEditor(self, parent, option, index):
+        editor = QComboBox(parent)
+        editor.setEditable(True)
+        editor.addItems([""] + list(self.get_groups()))
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data(Qt.ItemDataRole.EditRole) or "")
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText())
@@ -1,14 +1,27 @@
 import sys
-import socket
-import paramiko
-import json
 import os
+import getpass
 import time
 from datetime import datetime, timedelta
-from threading import Thread
-from PyQt6.QtWidgets import *
-from PyQt6.QtCore import *
-from PyQt6.QtGui import QPixmap, QFont
+from threading import Event, Thread
+from PyQt6.QtWidgets import (
+    QAbstractItemView, QApplication, QCheckBox, QComboBox, QDialog, QDialogButtonBox, QFormLayout, QFrame,
+    QGridLayout, QGroupBox, QHBoxLayout, QHeaderView, QInputDialog, QLabel, QLineEdit, QMainWindow, QMenu,
+    QMessageBox, QProgressBar, QPushButton, QSpinBox, QTableView, QTimeEdit, QVBoxLayout, QWidget)
+from PyQt6.QtCore import QItemSelection, QItemSelectionModel, QSize, Qt, QTime, QTimer, pyqtSignal
+from PyQt6.QtGui import QFont, QImageReader, QPixmap
+
+from etap_control import ControlClient
+from etap_data import DataManager
+from etap_metrics import METRICS
+from etap_models import ActionDelegate, BoardFilterProxy, BoardTableModel, GroupDelegate, ScheduleModel, TimeDelegate
+from etap_scanner import NetworkScanner, TargetSet, passive_candidates
+from etap_schedule import CompiledSchedule, ScheduleError
+from etap_service import EtapService, running_pid
+from etap_ssh import STATUS_LABELS, BoardResult, summarize
+
+# İstemci kipinde servisin yoklanma aralığı (sn)
+POLL_INTERVAL = 2
 
 # Pardus 25 / Wayland uyumluluğu
 os.environ["QT_QPA_PLATFORM"] = "xcb"
@@ -35,29 +48,19 @@ QPushButton#BtnUnlock { background-color: #2ecc71; color: white; border: none; }
 QPushButton#BtnAction { background-color: #3498db; color: white; border: none; }
 """
 
-class DataManager:
-    SETTINGS_FILE = "ayarlar.json"
-    SCHEDULE_FILE = "program.json"
-    IPS_FILE = "tahtalar.json"
-
-    @staticmethod
-    def save_json(file, data):
-        with open(file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-
-    @staticmethod
-    def load_json(file, default):
-        if os.path.exists(file):
-            try:
-                with open(file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except: return default
-        return default
-
 class EtapKilitPaneli(QMainWindow):
-    found_ip_signal = pyqtSignal(str)
+    found_batch_signal = pyqtSignal(list)
     progress_signal = pyqtSignal(int)
     progress_visible_signal = pyqtSignal(bool)
+    status_signal = pyqtSignal(str)
+    bell_signal = pyqtSignal(str, list)
+    health_signal = pyqtSignal(list)
+    results_signal = pyqtSignal(list, str)
+    # İstemci kipi: servisten yoklanan durum ve kip değişimi (servis PID'i, 0: yerel)
+    poll_signal = pyqtSignal(dict)
+    mode_signal = pyqtSignal(int)
+    # İlk çizimden sonraki hazırlık bitti: kayıtlı tahtalar listede, servis çalışıyor
+    ready_signal = pyqtSignal()
 
     def __init__(self):
         super().__init__()
@@ -65,27 +68,90 @@ class EtapKilitPaneli(QMainWindow):
         self.setMinimumSize(1250, 850)
         self.setStyleSheet(STYLE_SHEET)
 
-        # Veri Yükleme
-        self.config = DataManager.load_json(DataManager.SETTINGS_FILE, {
-            "user": "etapadmin", "pass": "etap+pardus!", "ip_range": "10.46.197.0/24"
-        })
-        self.schedule = DataManager.load_json(DataManager.SCHEDULE_FILE, {day: [] for day in ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"]})
-        self.saved_ips = DataManager.load_json(DataManager.IPS_FILE, [])
+        # Zil modu, keşif, izleme ve yeniden deneme Qt'den bağımsız çekirdekte
+        # çalışır (etap_service.py); sonuçlar sinyallerle gelir
+        self.service = EtapService(
+            get_targets=lambda: self.boards,
+            get_credentials=lambda: (self.u_in.text(), self.p_in.text()),
+            on_wave=self.bell_signal.emit, on_health=self.health_signal.emit,
+            on_retry=self.on_retry, on_found=self.found_batch_signal.emit, on_status=self.status_signal.emit)
+        self.config = self.service.config
+        self.inventory = self.service.inventory
+        self.states = self.service.states
+        self.fanout = self.service.fanout
+        # Arka plan servisi çalışıyorsa zil modunu o yürütür, panel yalnızca
+        # istemcidir. Servis süreci yaşarken panel zil modunu hiçbir koşulda
+        # başlatmaz; soket yanıt vermezse yeniden bağlanmayı bekler (poll_loop).
+        self.daemon_pid = running_pid()
+        # GUI iş parçacığından yapılan çağrılar kısa zaman aşımıyla sınırlıdır
+        self.control = ControlClient(timeout=self.config.get("control_timeout", 5))
+        self._started = False
+        # Soket izni yoksa (panel kullanıcısı etapkilit grubunda değil) servise
+        # komut gönderilemez; panel yine de ikinci bir zil modu başlatmaz
+        self.socket_denied = bool(self.daemon_pid) and not self.control.reachable()
+        # İstemci kipinde tahta durumları servisten okunur (canlılık -> son bilinen)
+        self.service_health = {}
+        # Servise ulaşılamadığı için okutulamayan program kaydı: bağlantı gelince
+        self._reload_pending = False
+        self._poll_wake = Event()
 
         self.init_ui()
         
         # Sinyal Bağlantıları
-        self.found_ip_signal.connect(self.board_list.addItem)
+        self.found_batch_signal.connect(self.add_boards)
         self.progress_signal.connect(self.pbar.setValue)
         self.progress_visible_signal.connect(self.pbar.setVisible)
-        
-        # Kayıtlı IP'leri Yükle
-        if self.saved_ips:
-            self.board_list.addItems(self.saved_ips)
-        
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.check_bell_mode)
-        self.timer.start(30000)
+        self.status_signal.connect(self.statusBar().showMessage)
+        errors = self.service.compiled.errors
+        if errors:
+            self.statusBar().showMessage(f"program.json: {len(errors)} hatalı kayıt yok sayıldı ({errors[0]})")
+        elif self.socket_denied:
+            self.statusBar().showMessage(f"Servis çalışıyor (PID {self.daemon_pid}) ancak kontrol soketine erişim yok (kullanıcı etapkilit grubunda değil); komutlar gönderilemez.")
+        elif self.daemon_pid:
+            self.statusBar().showMessage(f"Zil modu arka plan servisinde çalışıyor (PID {self.daemon_pid}).")
+
+        # Arka plan iş parçacıkları tahta listesinin anlık görüntüsünü okur
+        model = self.board_model
+        model.rowsInserted.connect(self.sync_boards)
+        model.rowsRemoved.connect(self.sync_boards)
+        model.modelReset.connect(self.sync_boards)
+        self.sync_boards()
+        self.results_signal.connect(self.board_model.record)
+        self.health_signal.connect(self.on_health)
+        self.bell_signal.connect(self.on_bell_wave)
+        self.poll_signal.connect(self.on_service_poll)
+        self.mode_signal.connect(self.set_mode)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        # Pencere önce boş listeyle çizilir; logo, kayıtlı tahtalar ve ağ işleri
+        # olay döngüsünün bir sonraki turunda yüklenir
+        if not self._started:
+            self._started = True
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        pix = self.load_logo("school_logo.png", 80)
+        if not pix.isNull():
+            self.logo.setPixmap(pix)
+        # Kayıtlı IP'ler ve son bilinen durumlar diskten, ağa çıkmadan önce gelir
+        self.board_model.set_boards(self.inventory.ips(), self.states.snapshot())
+        self.refresh_groups()
+        # İstemci kipinde izleme, keşif ve zil servistedir; panel ikinci bir
+        # kopyasını çalıştırmaz, durumları poll_loop ile servisten alır
+        if not self.daemon_pid:
+            self.service.start()
+        Thread(target=self.poll_loop, daemon=True).start()
+        self.ready_signal.emit()
+
+    @staticmethod
+    def load_logo(path, size):
+        # Büyük logo tam boyutta açılıp küçültülmez, okunurken ölçeklenir
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        if reader.size().isValid():
+            reader.setScaledSize(reader.size().scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio))
+        return QPixmap.fromImage(reader.read())
 
     def init_ui(self):
         central = QWidget()
@@ -98,11 +164,9 @@ class EtapKilitPaneli(QMainWindow):
         header = QFrame(); header.setObjectName("Header"); header.setFixedHeight(110)
         h_layout = QHBoxLayout(header)
         
-        logo = QLabel()
-        pix = QPixmap("school_logo.png")
-        if not pix.isNull():
-            logo.setPixmap(pix.scaled(80, 80, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
-        h_layout.addWidget(logo)
+        # Logo ilk çizimden sonra yüklenir; yer şimdiden ayrılır
+        self.logo = QLabel(); self.logo.setFixedSize(QSize(80, 80)); self.logo.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        h_layout.addWidget(self.logo)
 
         title = QLabel("KAHRAMANMARAŞ / ONİKİŞUBAT\nTicaret ve Sanayi Odası Ticaret Mesleki ve Teknik Anadolu Lisesi")
         title.setObjectName("SchoolTitle"); h_layout.addWidget(title)
@@ -123,13 +187,30 @@ class EtapKilitPaneli(QMainWindow):
         # SOL: AĞ VE IP LİSTESİ
         col1 = QVBoxLayout()
         col1.addWidget(QLabel("<b>AĞ TARAMA VE KAYITLI TAHTALAR</b>"))
-        self.ip_in = QLineEdit(self.config["ip_range"]); col1.addWidget(self.ip_in)
+        self.ip_in = QLineEdit(self.config["ip_range"]); self.ip_in.setPlaceholderText("Örn: 10.46.196.0/22, 10.47.10.0/24 !10.46.196.1"); col1.addWidget(self.ip_in)
         btn_h = QHBoxLayout()
         btn_scan = QPushButton("🔍 Tahtaları Tara"); btn_scan.setObjectName("BtnAction"); btn_scan.clicked.connect(self.start_scan)
         btn_clear = QPushButton("🗑 Listeyi Temizle"); btn_clear.clicked.connect(self.clear_list)
         btn_h.addWidget(btn_scan); btn_h.addWidget(btn_clear)
         col1.addLayout(btn_h)
-        self.board_list = QListWidget(); self.board_list.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection); col1.addWidget(self.board_list)
+        self.full_scan_cb = QCheckBox("Tam tarama (kayıtlı listeyi sıfırla)"); col1.addWidget(self.full_scan_cb)
+        # Grup seçimi: etiketler, kat/oda ve ayarlar.json grupları tek seferde seçilir
+        self.group_cb = QComboBox(); self.group_cb.activated.connect(self.select_group); col1.addWidget(self.group_cb)
+        # Binlerce tahta: model/görünüm tablosu, süzme ve sıralama vekil modelde
+        self.filter_in = QLineEdit(); self.filter_in.setPlaceholderText("Süz: IP, ad, grup, durum..."); col1.addWidget(self.filter_in)
+        self.board_model = BoardTableModel(self.inventory, self)
+        self.board_proxy = BoardFilterProxy(self); self.board_proxy.setSourceModel(self.board_model)
+        self.filter_in.textChanged.connect(self.board_proxy.setFilterFixedString)
+        self.board_list = QTableView(); self.board_list.setModel(self.board_proxy); col1.addWidget(self.board_list)
+        self.board_list.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.board_list.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
+        self.board_list.setSortingEnabled(True); self.board_list.sortByColumn(BoardTableModel.IP, Qt.SortOrder.AscendingOrder)
+        self.board_list.verticalHeader().setVisible(False)
+        self.board_list.verticalHeader().setDefaultSectionSize(22)
+        self.board_list.horizontalHeader().setStretchLastSection(True)
+        self.board_list.doubleClicked.connect(lambda index: self.show_history(self.board_model.ip(self.board_proxy.mapToSource(index).row())))
+        self.board_list.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.board_list.customContextMenuRequested.connect(self.board_menu)
         body.addLayout(col1, 2)
 
         # ORTA: MANUEL KONTROL
@@ -141,7 +222,13 @@ class EtapKilitPaneli(QMainWindow):
         col2.addSpacing(30)
         btn_l = QPushButton("🔒 SEÇİLİLERİ KİLİTLE"); btn_l.setObjectName("BtnLock"); btn_l.setFixedHeight(50); btn_l.clicked.connect(lambda: self.start_manage("lock")); col2.addWidget(btn_l)
         btn_u = QPushButton("🔓 SEÇİLİLERİ AÇ"); btn_u.setObjectName("BtnUnlock"); btn_u.setFixedHeight(50); btn_u.clicked.connect(lambda: self.start_manage("unlock")); col2.addWidget(btn_u)
+        self.force_cb = QCheckBox("Durumu zaten uygun olanlara da gönder (zorla)"); col2.addWidget(self.force_cb)
         col2.addStretch()
+        stats_group = QGroupBox("Canlı İstatistikler")
+        stats_layout = QVBoxLayout()
+        self.stats_lbl = QLabel("Henüz ölçüm yok."); self.stats_lbl.setFont(QFont("monospace", 9)); stats_layout.addWidget(self.stats_lbl)
+        stats_group.setLayout(stats_layout); col2.addWidget(stats_group)
+        stats_timer = QTimer(self); stats_timer.timeout.connect(self.refresh_stats); stats_timer.start(2000)
         body.addLayout(col2, 1)
 
         # SAĞ: ZİL MODU VE SİHİRBAZ
@@ -157,8 +244,21 @@ class EtapKilitPaneli(QMainWindow):
         btn_gen = QPushButton("🪄 Tabloyu Otomatik Doldur"); btn_gen.clicked.connect(self.generate_daily_schedule); wiz_layout.addWidget(btn_gen, 3, 0, 1, 4)
         wiz_group.setLayout(wiz_layout); col3.addWidget(wiz_group)
 
-        self.day_cb = QComboBox(); self.day_cb.addItems(self.schedule.keys()); self.day_cb.currentIndexChanged.connect(self.load_day); col3.addWidget(self.day_cb)
-        self.table = QTableWidget(0, 3); self.table.setHorizontalHeaderLabels(["Başlangıç", "Bitiş", "İşlem"]); self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch); col3.addWidget(self.table)
+        self.day_cb = QComboBox(); self.day_cb.addItems(self.service.schedule.keys()); self.day_cb.currentIndexChanged.connect(self.load_day); col3.addWidget(self.day_cb)
+        # Program düzenleyici: tüm hafta modelde, hücre düzenleyicileri yalnızca düzenlerken oluşur
+        self.schedule_model = ScheduleModel(self.service.schedule, self)
+        self.table = QTableView(); self.table.setModel(self.schedule_model); self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch); col3.addWidget(self.table)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setItemDelegateForColumn(ScheduleModel.START, TimeDelegate(self.table))
+        self.table.setItemDelegateForColumn(ScheduleModel.END, TimeDelegate(self.table))
+        self.table.setItemDelegateForColumn(ScheduleModel.ACTION, ActionDelegate(self.table))
+        self.table.setItemDelegateForColumn(ScheduleModel.GROUP, GroupDelegate(lambda: list(self.inventory.labels()) + sorted(self.config.get("groups", {})), self.table))
+        h_rows = QHBoxLayout()
+        btn_add = QPushButton("➕ Dilim Ekle"); btn_add.clicked.connect(lambda: self.schedule_model.add_slot())
+        btn_del = QPushButton("➖ Seçili Dilimleri Sil"); btn_del.clicked.connect(lambda: self.schedule_model.remove_rows([i.row() for i in self.table.selectionModel().selectedRows()]))
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        h_rows.addWidget(btn_add); h_rows.addWidget(btn_del)
+        col3.addLayout(h_rows)
         
         h_btns_right = QHBoxLayout()
         btn_copy = QPushButton("📅 Tüm Haftaya Kopyala"); btn_copy.clicked.connect(self.copy_all)
@@ -178,101 +278,422 @@ class EtapKilitPaneli(QMainWindow):
 
     # --- IP YÖNETİMİ ---
     def clear_list(self):
-        self.board_list.clear()
-        DataManager.save_json(DataManager.IPS_FILE, [])
+        try:
+            self.update_boards({"cmd": "clear"})
+        except RuntimeError as e:
+            QMessageBox.warning(self, "Uyarı", str(e))
+            return
+        self.board_model.clear()
+
+    def update_boards(self, req):
+        # Envanteri servis çalışıyorsa o yazar (zil hedefleri ondadır); panel
+        # ardından tahtalar.json'u yeniden okur. Her iş parçacığından çağrılabilir.
+        if self.daemon_pid:
+            self.service_call(req)
+            self.inventory.reload()
+        elif req["cmd"] == "seen":
+            self.service.boards_seen(req["ips"], replace=req.get("replace", False))
+        else:
+            self.service.clear_boards()
+
+    def service_call(self, req):
+        # Servise ulaşılamazsa (yeniden başlıyor, yanıt vermiyor, soket izni yok)
+        # RuntimeError; yoklama hemen yeniden denenir ve kip orada belirlenir
+        try:
+            return self.control.call(req)
+        except OSError as e:
+            self._poll_wake.set()
+            raise RuntimeError(f"Servise ulaşılamıyor ({e}); yeniden bağlanılıyor.") from e
+
+    def set_mode(self, pid):
+        # Yalnızca GUI iş parçacığında (mode_signal): servis geri geldiyse panel
+        # kendi zil modunu durdurur; servis süreci gerçekten yoksa devralır
+        if pid and not self.daemon_pid:
+            self.daemon_pid = pid
+            self.service.suspend()
+            self.service_health = {}
+            self.statusBar().showMessage(f"Servis çalışıyor (PID {pid}); zil modu ve izleme yeniden serviste.")
+        elif not pid and self.daemon_pid and not running_pid():
+            self.daemon_pid = None
+            self.service.start()
+            self.statusBar().showMessage("Servis durdu; zil modu ve izleme panelde çalışıyor.")
+        self._poll_wake.set()
 
     def start_scan(self):
-        self.board_list.clear()
+        # CIDR / çoklu ağ ayrıştırma: "10.46.196.0/22, 10.47.10.0/24 !10.46.196.1"
+        try:
+            hosts = TargetSet.parse(self.ip_in.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Uyarı", str(e))
+            return
+        # Artımlı tarama: kayıtlı tahtalar listede kalır, önce onlar doğrulanır
+        full = self.full_scan_cb.isChecked() or not len(self.inventory)
+        known = [] if full else self.inventory.ips()
+        if full:
+            self.board_model.clear()
         self.progress_visible_signal.emit(True)
-        prefix = ".".join(self.ip_in.text().split('/')[0].split('.')[:3])
-        
+
         def run():
-            current_found = []
-            for i in range(1, 255):
-                ip = f"{prefix}.{i}"
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(0.04)
-                    if s.connect_ex((ip, 22)) == 0:
-                        self.found_ip_signal.emit(ip)
-                        current_found.append(ip)
-                self.progress_signal.emit(int((i / 254) * 100))
-            
-            DataManager.save_json(DataManager.IPS_FILE, current_found)
+            scanner = NetworkScanner(concurrency=self.config.get("scan_concurrency", 256))
+            if known:
+                alive = scanner.scan(known)
+                try:
+                    self.update_boards({"cmd": "seen", "ips": alive})
+                except RuntimeError as e:
+                    self.status_signal.emit(f"Tahtalar servise kaydedilemedi: {e}")
+                    self.progress_visible_signal.emit(False)
+                    return
+                self.status_signal.emit(f"Kayıtlı {len(known)} tahtadan {len(alive)} tanesi çevrimiçi; yeni adresler taranıyor...")
+            # Önce çekirdeğin komşu tablosundaki adresler yoklanır
+            neighbors = passive_candidates(hosts, known)
+            found = scanner.scan(neighbors, on_batch=self.found_batch_signal.emit)
+            # Aktif tarama yalnızca kalan boşluklar için yapılır
+            if not self.config.get("passive_only", False):
+                found += scanner.scan(hosts.without(known + neighbors), on_batch=self.found_batch_signal.emit, on_progress=self.progress_signal.emit)
+            try:
+                self.update_boards({"cmd": "seen", "ips": found, "replace": full})
+            except RuntimeError as e:
+                self.status_signal.emit(f"Tahtalar servise kaydedilemedi: {e}")
+                self.progress_visible_signal.emit(False)
+                return
+            if full:
+                # Kapalı olsa da adı/etiketi girilmiş tahtalar listede kalır
+                self.found_batch_signal.emit(self.inventory.ips())
+            self.status_signal.emit(f"Tarama tamamlandı: {len(found)} yeni tahta, toplam {len(self.inventory)} kayıtlı tahta.")
             time.sleep(1); self.progress_visible_signal.emit(False)
             
         Thread(target=run, daemon=True).start()
 
+    def add_boards(self, ips):
+        # Pasif keşif ve tarama aynı tahtayı iki kez eklemesin (model ayıklar)
+        self.board_model.add(ips)
+
+    def on_health(self, changes):
+        self.board_model.update_health(changes)
+
+    def selected_ips(self):
+        rows = self.board_list.selectionModel().selectedRows()
+        return [self.board_model.ip(self.board_proxy.mapToSource(index).row()) for index in rows]
+
+    # --- GRUPLAR VE ETİKETLER ---
+    def refresh_groups(self):
+        self.group_cb.clear()
+        self.group_cb.addItem("— Grup seç —", None)
+        for label, n in self.inventory.labels().items():
+            self.group_cb.addItem(f"{label} ({n})", label)
+        for name in sorted(self.config.get("groups", {})):
+            self.group_cb.addItem(f"{name} (IP aralığı)", name)
+        self.board_model.refresh_registry()
+
+    def select_group(self, index):
+        # 200 tahta tek bir seçim işlemiyle seçilir: ardışık satırlar aralık olur
+        name = self.group_cb.itemData(index)
+        if name is None:
+            return
+        try:
+            members = self.service.group(name)
+        except ValueError as e:
+            QMessageBox.warning(self, "Uyarı", str(e))
+            return
+        # Görünen (süzgeçten geçen) satırlar, vekil modeldeki sırayla
+        proxy, model = self.board_proxy, self.board_model
+        rows = sorted(r for r in (proxy.mapFromSource(model.index(model.row(ip), 0)).row() for ip in members if model.row(ip) is not None) if r >= 0)
+        selection = QItemSelection()
+        i = 0
+        while i < len(rows):
+            j = i
+            while j + 1 < len(rows) and rows[j + 1] == rows[j] + 1:
+                j += 1
+            selection.select(proxy.index(rows[i], 0), proxy.index(rows[j], 0))
+            i = j + 1
+        flags = QItemSelectionModel.SelectionFlag.ClearAndSelect | QItemSelectionModel.SelectionFlag.Rows
+        self.board_list.selectionModel().select(selection, flags)
+        self.statusBar().showMessage(f"{name}: {len(rows)} tahta seçildi.")
+
+    def board_menu(self, pos):
+        selected = self.selected_ips()
+        clicked = self.board_list.indexAt(pos)
+        if clicked.isValid():
+            ip = self.board_model.ip(self.board_proxy.mapToSource(clicked).row())
+            if ip not in selected:
+                selected = [ip]
+        if not selected:
+            return
+        menu = QMenu(self)
+        act_tag = menu.addAction(f"🏷 Etiket ekle ({len(selected)} tahta)...")
+        act_untag = menu.addAction("Etiket kaldır...")
+        act_info = menu.addAction("✏ Ad / oda / kat...") if len(selected) == 1 else None
+        chosen = menu.exec(self.board_list.viewport().mapToGlobal(pos))
+        if chosen in (act_tag, act_untag):
+            remove = chosen is act_untag
+            tag, ok = QInputDialog.getText(self, "Etiket", "Etiket adı (örn: fen, 2-kat-dogu):")
+            if ok and tag.strip():
+                self.edit_registry({"cmd": "tag", "ips": selected, "tag": tag, "remove": remove})
+        elif chosen is not None and chosen is act_info:
+            self.edit_board(selected[0])
+
+    def edit_board(self, ip):
+        st = self.inventory.get(ip)
+        dlg = QDialog(self); dlg.setWindowTitle(ip)
+        form = QFormLayout(dlg)
+        name_in = QLineEdit(st.get("name", "")); form.addRow("Ad:", name_in)
+        room_in = QLineEdit(st.get("room", "")); form.addRow("Oda:", room_in)
+        floor_in = QLineEdit(str(st.get("floor", ""))); form.addRow("Kat:", floor_in)
+        tags_in = QLineEdit(", ".join(st.get("tags", []))); form.addRow("Etiketler:", tags_in)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(dlg.accept); buttons.rejected.connect(dlg.reject); form.addRow(buttons)
+        if dlg.exec() != QDialog.DialogCode.Accepted:
+            return
+        tags = sorted({t.strip() for t in tags_in.text().split(",") if t.strip()})
+        self.edit_registry({"cmd": "describe", "ip": ip, "name": name_in.text().strip(), "room": room_in.text().strip(),
+                            "floor": floor_in.text().strip(), "tags": tags})
+
+    def edit_registry(self, req):
+        # Servis çalışıyorsa tahtalar.json'u o yazar; panel ardından yeniden okur
+        try:
+            if self.daemon_pid:
+                self.service_call(req)
+                self.inventory.reload()
+            elif req["cmd"] == "tag":
+                self.inventory.tag(req["ips"], req["tag"], remove=req["remove"])
+            else:
+                self.inventory.describe(req["ip"], **{k: v for k, v in req.items() if k not in ("cmd", "ip")})
+        except (ValueError, RuntimeError) as e:
+            QMessageBox.warning(self, "Uyarı", str(e))
+            return
+        self.refresh_groups()
+
     def start_manage(self, action):
-        selected = [item.text() for item in self.board_list.selectedItems()]
+        selected = self.selected_ips()
         if not selected: return
+        force = self.force_cb.isChecked()
         self.progress_visible_signal.emit(True)
         
         def run():
             total = len(selected)
-            for idx, ip in enumerate(selected):
-                self.execute_ssh(ip, action)
-                self.progress_signal.emit(int(((idx+1)/total)*100))
-            time.sleep(1); self.progress_visible_signal.emit(False)
-        Thread(target=run, daemon=True).start()
+            done = []
 
-    def execute_ssh(self, ip, action):
-        try:
-            ssh = paramiko.SSHClient(); ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(ip, username=self.u_in.text(), password=self.p_in.text(), timeout=4)
-            if action == "lock":
-                cmd = "dbus-send --system --dest=org.freedesktop.DisplayManager --type=method_call /org/freedesktop/DisplayManager/Seat0 org.freedesktop.DisplayManager.Seat.Lock"
+            def on_result(res):
+                done.append(res)
+                self.results_signal.emit([res], action)
+                self.progress_signal.emit(int((len(done) / total) * 100))
+
+            # Tahtalar paralel işlenir; ilerleme liste sırasına değil tamamlanmaya göre
+            try:
+                results, skipped = self.manage(selected, action, force, on_result)
+            except (OSError, RuntimeError) as e:
+                self.status_signal.emit(f"İşlem tamamlanamadı: {e}")
+                self.progress_visible_signal.emit(False)
+                return
+            if not results:
+                self.status_signal.emit(f"{total} tahta zaten istenen durumda; yeniden göndermek için 'zorla' seçeneğini işaretleyin.")
             else:
-                # Kesin Çözüm Kilit Açma
-                cmd = "dbus-send --system --dest=org.freedesktop.login1 /org/freedesktop/login1 org.freedesktop.login1.Manager.UnlockSessions"
-            ssh.exec_command(cmd); ssh.close()
-        except: pass
+                note = f" ({skipped} tahta zaten uygun durumda)" if skipped else ""
+                self.status_signal.emit(f"{len(results)} tahta: {summarize(results)}{note}")
+            time.sleep(1)
+            self.progress_visible_signal.emit(False)
+
+        Thread(target=run, daemon=True).start()
+
+    def manage(self, ips, action, force, on_result):
+        if self.daemon_pid:
+            # İstemci kipi: komut servisin SSH havuzundan gönderilir, sonuçlar akarak
+            # gelir. Sonuçlar arasındaki bekleme tahta başına süre sınırını aşmaz.
+            client = ControlClient(self.control.path, timeout=self.config.get("manage_deadline", 15) + self.control.timeout)
+            results, msg = [], {}
+            try:
+                for msg in client.request({"cmd": action, "ips": ips, "force": force, "source": "panel"}):
+                    if msg.get("done") and msg.get("error"):
+                        raise RuntimeError(msg["error"])
+                    if "ip" in msg:
+                        res = BoardResult(**msg)
+                        results.append(res)
+                        on_result(res)
+            except OSError as e:
+                # Servis yaşarken panel komutu kendisi göndermez
+                self._poll_wake.set()
+                raise RuntimeError(f"Servise ulaşılamıyor ({e}); yeniden bağlanılıyor.") from e
+            return results, msg.get("skipped", 0)
+        return self.service.apply(ips, action, force, on_result, source=f"panel:{getpass.getuser()}")
 
     # --- DİĞER FONKSİYONLAR ---
     def generate_daily_schedule(self):
-        self.table.setRowCount(0)
+        slots = []
         current_dt = datetime.combine(datetime.today(), self.start_time.time().toPyTime())
         for i in range(1, self.lesson_count.value() + 1):
             s_str = current_dt.strftime("%H:%M")
             current_dt += timedelta(minutes=self.lesson_dur.value())
             e_str = current_dt.strftime("%H:%M")
-            self.add_slot(s_str, e_str, "unlock")
+            slots.append({"start": s_str, "end": e_str, "action": "unlock"})
             if i < self.lesson_count.value():
                 b_start = current_dt.strftime("%H:%M")
                 dur = self.lunch_dur.value() if i == self.lunch_after.value() else self.break_dur.value()
                 current_dt += timedelta(minutes=dur)
                 b_end = current_dt.strftime("%H:%M")
-                self.add_slot(b_start, b_end, "lock")
-
-    def add_slot(self, s, e, a):
-        row = self.table.rowCount(); self.table.insertRow(row)
-        self.table.setItem(row, 0, QTableWidgetItem(s)); self.table.setItem(row, 1, QTableWidgetItem(e))
-        cb = QComboBox(); cb.addItems(["Kilitle (Tenefüs)", "Aç (Ders)"]); cb.setCurrentIndex(0 if a == "lock" else 1)
-        self.table.setCellWidget(row, 2, cb)
+                slots.append({"start": b_start, "end": b_end, "action": "lock"})
+        self.schedule_model.set_slots(slots)
 
     def load_day(self):
-        self.table.setRowCount(0)
-        for s in self.schedule.get(self.day_cb.currentText(), []): self.add_slot(s["start"], s["end"], s["action"])
+        # Gün değişimi yalnızca modeli sıfırlar; düzenlemeler kaydedilene kadar modelde kalır
+        self.schedule_model.set_day(self.day_cb.currentText())
+
+    def apply_schedule(self, schedule):
+        # Hatalı program kaydedilmez; derlenmiş hali zil zamanlayıcısına verilir
+        try:
+            compiled = CompiledSchedule.compile(schedule)
+        except ScheduleError as e:
+            QMessageBox.warning(self, "Programda Hata", str(e))
+            return False
+        unknown = [g for g in compiled.group_names() if self.inventory.members(g) is None and g not in self.config.get("groups", {})]
+        if unknown:
+            QMessageBox.warning(self, "Programda Hata", f"Bilinmeyen grup: {', '.join(unknown)}")
+            return False
+        self.service.compiled = compiled
+        self.service.schedule = schedule
+        return True
 
     def save_all(self):
+        if not self.apply_schedule(self.schedule_model.schedule()):
+            return
         self.config.update({"user": self.u_in.text(), "pass": self.p_in.text(), "ip_range": self.ip_in.text()})
         DataManager.save_json(DataManager.SETTINGS_FILE, self.config)
-        slots = [{"start": self.table.item(r,0).text(), "end": self.table.item(r,1).text(), "action": "lock" if self.table.cellWidget(r,2).currentIndex()==0 else "unlock"} for r in range(self.table.rowCount())]
-        self.schedule[self.day_cb.currentText()] = slots
-        DataManager.save_json(DataManager.SCHEDULE_FILE, self.schedule)
+        DataManager.save_json(DataManager.SCHEDULE_FILE, self.service.schedule)
+        self.notify_scheduler()
         QMessageBox.information(self, "Bilgi", "Kaydedildi.")
 
     def copy_all(self):
-        slots = [{"start": self.table.item(r,0).text(), "end": self.table.item(r,1).text(), "action": "lock" if self.table.cellWidget(r,2).currentIndex()==0 else "unlock"} for r in range(self.table.rowCount())]
-        for d in self.schedule.keys(): self.schedule[d] = list(slots)
-        DataManager.save_json(DataManager.SCHEDULE_FILE, self.schedule)
+        self.schedule_model.copy_to_week()
+        if not self.apply_schedule(self.schedule_model.schedule()):
+            return
+        DataManager.save_json(DataManager.SCHEDULE_FILE, self.service.schedule)
+        self.notify_scheduler()
         QMessageBox.information(self, "Bilgi", "Haftalık program eşitlendi.")
 
-    def check_bell_mode(self):
-        now = datetime.now(); cur_t, cur_d = now.strftime("%H:%M"), ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"][now.weekday()]
-        for s in self.schedule.get(cur_d, []):
-            if s["start"] <= cur_t <= s["end"]:
-                for i in range(self.board_list.count()): self.execute_ssh(self.board_list.item(i).text(), s["action"])
-                break
+    def notify_scheduler(self):
+        # Servis programı ve ayarları diskten yeniden okur; servise ulaşılamazsa
+        # bağlantı geldiğinde poll_loop okutur
+        if not self.daemon_pid:
+            self.service.schedule_changed()
+            return
+        try:
+            self.control.call({"cmd": "reload"})
+        except OSError:
+            self._reload_pending = True
+            self._poll_wake.set()
+            self.statusBar().showMessage("Program kaydedildi; servise ulaşılınca yeniden okutulacak.")
+        except RuntimeError as e:
+            self.statusBar().showMessage(f"Servis programı yeniden okuyamadı: {e}")
+
+    def sync_boards(self, *args):
+        # Arka plan iş parçacıkları modele dokunmaz, bu anlık görüntüyü okur
+        self.boards = tuple(self.board_model.ips())
+
+    def show_history(self, ip):
+        # Tahtanın bugünkü işlem günlüğü
+        try:
+            records = self.service_call({"cmd": "history", "ip": ip})["records"] if self.daemon_pid else self.service.journal.today(ip)
+        except RuntimeError as e:
+            QMessageBox.warning(self, "Uyarı", str(e))
+            return
+        lines = [
+            f"{r['time'][11:]}  {'Kilitle' if r['action'] == 'lock' else 'Aç'}  {STATUS_LABELS.get(r['status'], r['status'])}  ({r['source']})"
+            for r in records[-30:]
+        ]
+        QMessageBox.information(self, f"{ip} — bugün", "\n".join(lines) or "Bugün bu tahtaya komut gönderilmedi.")
+
+    def refresh_stats(self):
+        # Servis çalışıyorsa ölçümler ondan, poll_loop ile gelir (SSH işlemlerini o yapıyor)
+        if not self.daemon_pid:
+            self.show_stats(METRICS.snapshot(), self.service.sync_report() if self.service.beacon else None)
+
+    def show_stats(self, snap, sync):
+        hist = {(h["name"], h["labels"].get("phase")): h for h in snap["histograms"]}
+        lines = []
+        for phase, label in (("connect", "TCP"), ("kex", "Anahtar"), ("auth", "Parola"), ("exec", "Komut")):
+            h = hist.get(("etap_ssh_phase_seconds", phase))
+            if h:
+                lines.append(f"{label:<8} p50 {h['p50'] * 1000:6.0f} ms  p95 {h['p95'] * 1000:6.0f} ms  ({h['count']})")
+        counts = {(c["name"], c["labels"].get("status") or c["labels"].get("result")): c["value"] for c in snap["counters"]}
+        done = [f"{n} {STATUS_LABELS[st]}" for (name, st), n in counts.items() if name == "etap_commands_total"]
+        if done:
+            lines.append("Komutlar: " + ", ".join(done))
+        gauges = {g["name"]: g["value"] for g in snap["gauges"]}
+        lines.append(f"Süren: {gauges.get('etap_commands_inflight', 0)}  Havuzdan: {counts.get(('etap_ssh_reused_total', None), 0)}"
+                     f"  Yeni bağlantı: {counts.get(('etap_ssh_connects_total', None), 0)}")
+        scan = [counts.get(("etap_scan_probes_total", r), 0) for r in ("open", "closed", "timeout")]
+        if any(scan):
+            lines.append(f"Tarama: {scan[0]} açık, {scan[1]} kapalı, {scan[2]} zaman aşımı")
+        if sync and (sync["synced"] or sync["stale"]):
+            lines.append(f"Tahta programı: {len(sync['synced'])} güncel, {len(sync['stale'])} eski, {len(sync['unknown'])} yanıtsız")
+        self.stats_lbl.setText("\n".join(lines))
+
+    def poll_loop(self):
+        # Arka plan: istemci kipinde servisin canlılık tablosu ve ölçümleri kısa
+        # zaman aşımıyla yoklanır; yanıt gelmezse aralık ikiye katlanarak
+        # (en çok 30 sn) yeniden denenir. Servis süreci service_grace saniye
+        # boyunca hiç yoksa (systemd yeniden başlatması bundan kısadır) panel
+        # yerel kipe geçer; yerel kipte servis başlarsa istemci kipine döner.
+        client = ControlClient(self.control.path, timeout=self.config.get("poll_timeout", 3))
+        delay, gone_since = POLL_INTERVAL, None
+        while True:
+            pid = running_pid()
+            if not self.daemon_pid:
+                if pid:
+                    self.mode_signal.emit(pid)
+                delay = POLL_INTERVAL
+            else:
+                try:
+                    if self._reload_pending:
+                        client.call({"cmd": "reload"})
+                        self._reload_pending = False
+                    self.poll_signal.emit({
+                        "health": client.call({"cmd": "health"})["health"],
+                        "metrics": client.call({"cmd": "metrics"})["metrics"],
+                        "sync": client.call({"cmd": "sync_status"}),
+                    })
+                    delay, gone_since = POLL_INTERVAL, None
+                except (OSError, RuntimeError, ValueError) as e:
+                    grace = self.config.get("service_grace", 30)
+                    if pid:
+                        gone_since = None
+                        self.status_signal.emit(f"Servise ulaşılamıyor ({e}); {delay} sn sonra yeniden denenecek.")
+                        delay = min(delay * 2, 30)
+                    elif gone_since is None:
+                        # Süreç yok: PID dosyası sık ve ucuzca yoklanır
+                        gone_since, delay = time.monotonic(), POLL_INTERVAL
+                        self.status_signal.emit(f"Servis durmuş; {grace} sn içinde geri gelmezse zil modunu panel devralacak.")
+                    elif time.monotonic() - gone_since >= grace:
+                        self.mode_signal.emit(0)
+            self._poll_wake.wait(delay)
+            self._poll_wake.clear()
+
+    def on_service_poll(self, reply):
+        # İstemci kipi: servisin izlediği tahtalar ve canlılık durumları; servisin
+        # keşfettiği tahtalar listeye eklenir
+        if not self.daemon_pid:
+            return
+        health = reply["health"]
+        new = self.board_model.add([ip for ip in health if ip not in self.service_health])
+        if new:
+            self.inventory.reload()
+            self.refresh_groups()
+        self.on_health([(ip, st) for ip, st in health.items() if self.service_health.get(ip) != st])
+        self.service_health = health
+        self.show_stats(reply["metrics"], reply["sync"])
+
+    def on_retry(self, action, results):
+        self.results_signal.emit(results, action)
+        label = "Kilitleme" if action == "lock" else "Kilit açma"
+        self.status_signal.emit(f"Yeniden deneme ({label}) {datetime.now().strftime('%H:%M')}: {len(results)} tahta: {summarize(results)}")
+
+    def on_bell_wave(self, action, results):
+        self.board_model.record(results, action)
+        label = "Kilitleme" if action == "lock" else "Kilit açma"
+        detail = f"{len(results)} tahta: {summarize(results)}" if results else "tüm tahtalar zaten uygun durumda"
+        self.statusBar().showMessage(f"Zil ({label}) {datetime.now().strftime('%H:%M')}: {detail}")
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv); win = EtapKilitPaneli(); win.show(); sys.exit(app.exec())
+    app = QApplication(sys.argv); win = EtapKilitPaneli(); win.show()
+    # Ertelenmiş durum kayıtları pencere kapanınca diske yazılır
+    app.aboutToQuit.connect(DataManager.flush)
+    sys.exit(app.exec())
@@ -1,6 +1,4 @@
 import sys
-import socket
-import paramiko
 import json
 import os
 from datetime import datetime
@@ -9,6 +7,11 @@ from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
 from PyQt6.QtGui import QPixmap, QFont
 
+from etap_data import DataManager as Store
+from etap_scanner import NetworkScanner, TargetSet
+from etap_schedule import DAYS, BellScheduler, CompiledSchedule, ScheduleError
+from etap_ssh import FanOut, SSHPool, summarize
+
 # Pardus 25 ve Wayland uyumluluğu için X11 zorlaması
 os.environ["QT_QPA_PLATFORM"] = "xcb"
 
@@ -28,8 +31,8 @@ QLineEdit { padding: 5px; border: 1px solid #ced4da; border-radius: 4px; }
 class DataManager:
     @staticmethod
     def save(file, data):
-        with open(file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        # Yarıda kesilen kayıt dosyayı bozmasın (geçici dosya + os.replace)
+        Store.save_json(file, data)
 
     @staticmethod
     def load(file, default):
@@ -41,22 +44,27 @@ class DataManager:
         return default
 
 class BoardWorker:
+    # Tüm işçiler tahta başına aynı SSH oturumunu paylaşır
+    pool = SSHPool(connect_timeout=5)
+
+    def execute(self, ip, user, password, action):
+        if action == "lock":
+            cmd = "dbus-send --system --dest=org.freedesktop.DisplayManager --type=method_call /org/freedesktop/DisplayManager/Seat0 org.freedesktop.DisplayManager.Seat.Lock"
+        else:
+            cmd = "export DISPLAY=:0; cinnamon-screensaver-command -d"
+        return self.pool.run(ip, user, password, cmd)
+
     def run_ssh(self, ip, user, password, action):
         try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(ip, username=user, password=password, timeout=5)
-            if action == "lock":
-                cmd = "dbus-send --system --dest=org.freedesktop.DisplayManager --type=method_call /org/freedesktop/DisplayManager/Seat0 org.freedesktop.DisplayManager.Seat.Lock"
-            else:
-                cmd = "export DISPLAY=:0; cinnamon-screensaver-command -d"
-            ssh.exec_command(cmd)
-            ssh.close()
+            res = self.execute(ip, user, password, action)
+            if res.exit_code != 0:
+                print(f"Hata ({ip}): çıkış kodu {res.exit_code} {res.stderr}")
         except Exception as e:
             print(f"Hata ({ip}): {e}")
 
 class EtapKilitPaneli(QMainWindow):
-    tahta_bulundu_sinyali = pyqtSignal(str)
+    tahtalar_bulundu_sinyali = pyqtSignal(list)
+    bell_signal = pyqtSignal(str, list)
 
     def __init__(self):
         super().__init__()
@@ -70,15 +78,24 @@ class EtapKilitPaneli(QMainWindow):
             "pass": "etap+pardus!", 
             "ip_range": "10.46.197"
         })
-        self.schedule = DataManager.load("program.json", {day: [] for day in ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"]})
+        self.schedule = DataManager.load("program.json", {day: [] for day in DAYS})
+        self.compiled = CompiledSchedule.compile(self.schedule, strict=False)
+        self.fanout = FanOut(workers=self.config.get("manage_workers", 32), deadline=self.config.get("manage_deadline", 15))
 
         self.init_ui()
-        self.tahta_bulundu_sinyali.connect(self.board_list.addItem)
-        
-        # Zil Kontrol Zamanlayıcısı
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.check_bell_mode)
-        self.timer.start(30000)
+        self.tahtalar_bulundu_sinyali.connect(self.board_list.addItems)
+        if self.compiled.errors:
+            self.statusBar().showMessage(f"program.json: {len(self.compiled.errors)} hatalı kayıt yok sayıldı ({self.compiled.errors[0]})")
+
+        # Zil modu GUI dışında, yalnızca geçiş anlarında uygulanır; sonuçlar sinyalle gelir
+        model = self.board_list.model()
+        model.rowsInserted.connect(self.sync_boards)
+        model.rowsRemoved.connect(self.sync_boards)
+        model.modelReset.connect(self.sync_boards)
+        self.sync_boards()
+        self.bell_signal.connect(self.on_bell_wave)
+        self.bell = BellScheduler(lambda: self.compiled, lambda: self.boards, self.run_wave, self.bell_signal.emit)
+        self.bell.start()
 
     def init_ui(self):
         central = QWidget()
@@ -186,15 +203,14 @@ class EtapKilitPaneli(QMainWindow):
         self.load_day()
 
     def scan_network(self):
+        try:
+            hosts = TargetSet.parse(self.ip_in.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Uyarı", str(e))
+            return
         self.board_list.clear()
-        prefix = self.ip_in.text()
         def wrk():
-            for i in range(1, 255):
-                ip = f"{prefix}.{i}"
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(0.1)
-                    if s.connect_ex((ip, 22)) == 0:
-                        self.tahta_bulundu_sinyali.emit(ip)
+            NetworkScanner(concurrency=self.config.get("scan_concurrency", 256)).scan(hosts, on_batch=self.tahtalar_bulundu_sinyali.emit)
         Thread(target=wrk, daemon=True).start()
 
     def manage_boards(self, act):
@@ -216,34 +232,49 @@ class EtapKilitPaneli(QMainWindow):
         for s in self.schedule.get(self.day_cb.currentText(), []):
             self.add_slot(s["start"], s["end"], s["action"])
 
+    def apply_schedule(self, schedule):
+        # Hatalı program kaydedilmez; derlenmiş hali zil zamanlayıcısına verilir
+        try:
+            self.compiled = CompiledSchedule.compile(schedule)
+        except ScheduleError as e:
+            QMessageBox.warning(self, "Programda Hata", str(e))
+            return False
+        self.schedule = schedule
+        return True
+
     def save_all(self):
-        self.config.update({"user": self.u_in.text(), "pass": self.p_in.text(), "ip_range": self.ip_in.text()})
-        DataManager.save("ayarlar.json", self.config)
         slots = []
         for r in range(self.table.rowCount()):
             slots.append({"start": self.table.item(r, 0).text(), "end": self.table.item(r, 1).text(), "action": "lock" if self.table.cellWidget(r, 2).currentIndex() == 0 else "unlock"})
-        self.schedule[self.day_cb.currentText()] = slots
+        if not self.apply_schedule({**self.schedule, self.day_cb.currentText(): slots}):
+            return
+        self.config.update({"user": self.u_in.text(), "pass": self.p_in.text(), "ip_range": self.ip_in.text()})
+        DataManager.save("ayarlar.json", self.config)
         DataManager.save("program.json", self.schedule)
+        self.bell.reload()
         QMessageBox.information(self, "Bilgi", "Ayarlar ve program kaydedildi.")
 
     def copy_all(self):
         slots = []
         for r in range(self.table.rowCount()):
             slots.append({"start": self.table.item(r, 0).text(), "end": self.table.item(r, 1).text(), "action": "lock" if self.table.cellWidget(r, 2).currentIndex() == 0 else "unlock"})
-        for d in self.schedule.keys():
-            self.schedule[d] = list(slots)
+        if not self.apply_schedule({d: list(slots) for d in self.schedule.keys()}):
+            return
         DataManager.save("program.json", self.schedule)
+        self.bell.reload()
         QMessageBox.information(self, "Bilgi", "Program tüm haftaya kopyalandı.")
 
-    def check_bell_mode(self):
-        now = datetime.now()
-        cur_t = now.strftime("%H:%M")
-        cur_d = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"][now.weekday()]
-        for s in self.schedule.get(cur_d, []):
-            if s["start"] <= cur_t <= s["end"]:
-                for i in range(self.board_list.count()):
-                    Thread(target=BoardWorker().run_ssh, args=(self.board_list.item(i).text(), self.u_in.text(), self.p_in.text(), s["action"]), daemon=True).start()
-                break
+    def sync_boards(self, *args):
+        # Arka plan iş parçacıkları QListWidget'a dokunmaz, bu anlık görüntüyü okur
+        self.boards = tuple(self.board_list.item(i).text() for i in range(self.board_list.count()))
+
+    def run_wave(self, ips, action):
+        user, password = self.u_in.text(), self.p_in.text()
+        return self.fanout.run(ips, lambda ip: BoardWorker().execute(ip, user, password, action))
+
+    def on_bell_wave(self, action, results):
+        label = "Kilitleme" if action == "lock" else "Kilit açma"
+        self.statusBar().showMessage(f"Zil ({label}) {datetime.now().strftime('%H:%M')}: {len(results)} tahta: {summarize(results)}")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1,6 +1,4 @@
 import sys
-import socket
-import paramiko
 import json
 import os
 import time
@@ -10,6 +8,11 @@ from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
 from PyQt6.QtGui import QPixmap, QFont
 
+from etap_data import DataManager as Store
+from etap_scanner import NetworkScanner, TargetSet
+from etap_schedule import DAYS, BellScheduler, CompiledSchedule, ScheduleError
+from etap_ssh import FanOut, SSHPool, STATUS_LABELS, summarize
+
 # Pardus 25 / Wayland uyumu için
 os.environ["QT_QPA_PLATFORM"] = "xcb"
 
@@ -37,8 +40,8 @@ QPushButton#BtnAction { background-color: #3498db; color: white; border: none; }
 class DataManager:
     @staticmethod
     def save(file, data):
-        with open(file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        # Yarıda kesilen kayıt dosyayı bozmasın (geçici dosya + os.replace)
+        Store.save_json(file, data)
 
     @staticmethod
     def load(file, default):
@@ -50,9 +53,11 @@ class DataManager:
         return default
 
 class EtapKilitPaneli(QMainWindow):
-    found_ip_signal = pyqtSignal(str)
+    found_batch_signal = pyqtSignal(list)
     progress_signal = pyqtSignal(int)
     progress_visible_signal = pyqtSignal(bool)
+    status_signal = pyqtSignal(str)
+    bell_signal = pyqtSignal(str, list)
 
     def __init__(self):
         super().__init__()
@@ -66,18 +71,31 @@ class EtapKilitPaneli(QMainWindow):
             "pass": "etap+pardus!", 
             "ip_range": "10.46.197.0/24"
         })
-        self.schedule = DataManager.load("program.json", {day: [] for day in ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"]})
+        self.schedule = DataManager.load("program.json", {day: [] for day in DAYS})
+        self.compiled = CompiledSchedule.compile(self.schedule, strict=False)
+        # Tahta başına kalıcı SSH oturumları (her işlemde yeniden el sıkışma yok)
+        self.ssh_pool = SSHPool(connect_timeout=5)
+        self.fanout = FanOut(workers=self.config.get("manage_workers", 32), deadline=self.config.get("manage_deadline", 15))
 
         self.init_ui()
         
         # UI Güncelleme Bağlantıları
-        self.found_ip_signal.connect(self.board_list.addItem)
+        self.found_batch_signal.connect(self.board_list.addItems)
         self.progress_signal.connect(self.pbar.setValue)
         self.progress_visible_signal.connect(self.pbar.setVisible)
+        self.status_signal.connect(self.statusBar().showMessage)
+        if self.compiled.errors:
+            self.statusBar().showMessage(f"program.json: {len(self.compiled.errors)} hatalı kayıt yok sayıldı ({self.compiled.errors[0]})")
         
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.check_bell_mode)
-        self.timer.start(30000)
+        # Zil modu GUI dışında, arka plan zamanlayıcısında çalışır; sonuçlar sinyalle gelir
+        model = self.board_list.model()
+        model.rowsInserted.connect(self.sync_boards)
+        model.rowsRemoved.connect(self.sync_boards)
+        model.modelReset.connect(self.sync_boards)
+        self.sync_boards()
+        self.bell_signal.connect(self.on_bell_wave)
+        self.bell = BellScheduler(lambda: self.compiled, lambda: self.boards, self.run_wave, self.bell_signal.emit)
+        self.bell.start()
 
     def init_ui(self):
         central = QWidget()
@@ -195,20 +213,18 @@ class EtapKilitPaneli(QMainWindow):
 
     # --- SSH VE TARAMA MANTIĞI ---
     def start_scan(self):
+        # CIDR / çoklu ağ ayrıştırma: "10.46.196.0/22, 10.47.10.0/24 !10.46.196.1"
+        try:
+            hosts = TargetSet.parse(self.ip_in.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Uyarı", str(e))
+            return
         self.board_list.clear()
         self.progress_visible_signal.emit(True)
-        # CIDR Ayrıştırma: 10.46.197.0/24 -> 10.46.197
-        raw_ip = self.ip_in.text().split('/')[0]
-        prefix = ".".join(raw_ip.split('.')[:3])
-        
+
         def run():
-            for i in range(1, 255):
-                ip = f"{prefix}.{i}"
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(0.04)
-                    if s.connect_ex((ip, 22)) == 0:
-                        self.found_ip_signal.emit(ip)
-                self.progress_signal.emit(int((i / 254) * 100))
+            scanner = NetworkScanner(concurrency=self.config.get("scan_concurrency", 256))
+            scanner.scan(hosts, on_batch=self.found_batch_signal.emit, on_progress=self.progress_signal.emit)
             time.sleep(0.5)
             self.progress_visible_signal.emit(False)
 
@@ -221,9 +237,17 @@ class EtapKilitPaneli(QMainWindow):
         
         def run():
             total = len(selected)
-            for idx, ip in enumerate(selected):
-                self.execute_ssh(ip, action)
-                self.progress_signal.emit(int(((idx + 1) / total) * 100))
+            done = []
+
+            def on_result(res):
+                done.append(res)
+                if not res.ok:
+                    print(f"Hata {res.ip}: {STATUS_LABELS[res.status]} ({res.error})")
+                self.progress_signal.emit(int((len(done) / total) * 100))
+
+            # Tahtalar paralel işlenir; ilerleme liste sırasına değil tamamlanmaya göre
+            results = self.fanout.run(selected, lambda ip: self.execute_ssh(ip, action), on_result)
+            self.status_signal.emit(f"{total} tahta: {summarize(results)}")
             time.sleep(1)
             self.progress_visible_signal.emit(False)
 
@@ -231,32 +255,23 @@ class EtapKilitPaneli(QMainWindow):
 
     def execute_ssh(self, ip, action):
         user, pw = self.u_in.text(), self.p_in.text()
-        try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(ip, username=user, password=pw, timeout=5)
-            
-            if action == "lock":
-                # Kesin Kilitleme
-                cmd = "dbus-send --system --dest=org.freedesktop.DisplayManager --type=method_call /org/freedesktop/DisplayManager/Seat0 org.freedesktop.DisplayManager.Seat.Lock"
-            else:
-                # KESİN KİLİT AÇMA (Pardus ETAP 23/25 Çözümü):
-                # 1. loginctl ile sistem kilidini düşür.
-                # 2. Oturum sahibinin DBus kanalına sız ve ScreenSaver'ı kapat.
-                cmd = (
-                    "export DISPLAY=:0; "
-                    "loginctl unlock-sessions; "
-                    "ACT_USR=$(stat -c '%U' /dev/tty7 2>/dev/null || echo 'etapadmin'); "
-                    "USR_ID=$(id -u $ACT_USR); "
-                    "export XDG_RUNTIME_DIR=/run/user/$USR_ID; "
-                    "export DBUS_SESSION_BUS_ADDRESS=unix:path=/run/user/$USR_ID/bus; "
-                    "dbus-send --session --dest=org.cinnamon.ScreenSaver --type=method_call /org/cinnamon/ScreenSaver org.cinnamon.ScreenSaver.SetActive boolean:false"
-                )
-            
-            ssh.exec_command(cmd)
-            ssh.close()
-        except Exception as e:
-            print(f"Hata {ip}: {e}")
+        if action == "lock":
+            # Kesin Kilitleme
+            cmd = "dbus-send --system --dest=org.freedesktop.DisplayManager --type=method_call /org/freedesktop/DisplayManager/Seat0 org.freedesktop.DisplayManager.Seat.Lock"
+        else:
+            # KESİN KİLİT AÇMA (Pardus ETAP 23/25 Çözümü):
+            # 1. loginctl ile sistem kilidini düşür.
+            # 2. Oturum sahibinin DBus kanalına sız ve ScreenSaver'ı kapat.
+            cmd = (
+                "export DISPLAY=:0; "
+                "loginctl unlock-sessions; "
+                "ACT_USR=$(stat -c '%U' /dev/tty7 2>/dev/null || echo 'etapadmin'); "
+                "USR_ID=$(id -u $ACT_USR); "
+                "export XDG_RUNTIME_DIR=/run/user/$USR_ID; "
+                "export DBUS_SESSION_BUS_ADDRESS=unix:path=/run/user/$USR_ID/bus; "
+                "dbus-send --session --dest=org.cinnamon.ScreenSaver --type=method_call /org/cinnamon/ScreenSaver org.cinnamon.ScreenSaver.SetActive boolean:false"
+            )
+        return self.ssh_pool.run(ip, user, pw, cmd)
 
     # --- DİĞER YARDIMCI FONKSİYONLAR ---
     def add_slot(self, s="08:10", e="08:50", a="unlock"):
@@ -274,33 +289,48 @@ class EtapKilitPaneli(QMainWindow):
         for s in self.schedule.get(self.day_cb.currentText(), []):
             self.add_slot(s["start"], s["end"], s["action"])
 
+    def apply_schedule(self, schedule):
+        # Hatalı program kaydedilmez; derlenmiş hali zil zamanlayıcısına verilir
+        try:
+            self.compiled = CompiledSchedule.compile(schedule)
+        except ScheduleError as e:
+            QMessageBox.warning(self, "Programda Hata", str(e))
+            return False
+        self.schedule = schedule
+        return True
+
     def save_all(self):
-        self.config.update({"user": self.u_in.text(), "pass": self.p_in.text(), "ip_range": self.ip_in.text()})
-        DataManager.save("ayarlar.json", self.config)
         slots = []
         for r in range(self.table.rowCount()):
             slots.append({"start": self.table.item(r, 0).text(), "end": self.table.item(r, 1).text(), "action": "lock" if self.table.cellWidget(r, 2).currentIndex() == 0 else "unlock"})
-        self.schedule[self.day_cb.currentText()] = slots
+        if not self.apply_schedule({**self.schedule, self.day_cb.currentText(): slots}):
+            return
+        self.config.update({"user": self.u_in.text(), "pass": self.p_in.text(), "ip_range": self.ip_in.text()})
+        DataManager.save("ayarlar.json", self.config)
         DataManager.save("program.json", self.schedule)
+        self.bell.reload()
         QMessageBox.information(self, "Bilgi", "Ayarlar ve program kaydedildi.")
 
     def copy_all(self):
         slots = []
         for r in range(self.table.rowCount()):
             slots.append({"start": self.table.item(r, 0).text(), "end": self.table.item(r, 1).text(), "action": "lock" if self.table.cellWidget(r, 2).currentIndex() == 0 else "unlock"})
-        for d in self.schedule.keys():
-            self.schedule[d] = list(slots)
+        if not self.apply_schedule({d: list(slots) for d in self.schedule.keys()}):
+            return
         DataManager.save("program.json", self.schedule)
+        self.bell.reload()
         QMessageBox.information(self, "Bilgi", "Program tüm haftaya kopyalandı.")
 
-    def check_bell_mode(self):
-        now = datetime.now()
-        cur_t, cur_d = now.strftime("%H:%M"), ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"][now.weekday()]
-        for s in self.schedule.get(cur_d, []):
-            if s["start"] <= cur_t <= s["end"]:
-                for i in range(self.board_list.count()):
-                    self.execute_ssh(self.board_list.item(i).text(), s["action"])
-                break
+    def sync_boards(self, *args):
+        # Arka plan iş parçacıkları QListWidget'a dokunmaz, bu anlık görüntüyü okur
+        self.boards = tuple(self.board_list.item(i).text() for i in range(self.board_list.count()))
+
+    def run_wave(self, ips, action):
+        return self.fanout.run(ips, lambda ip: self.execute_ssh(ip, action))
+
+    def on_bell_wave(self, action, results):
+        label = "Kilitleme" if action == "lock" else "Kilit açma"
+        self.statusBar().showMessage(f"Zil ({label}) {datetime.now().strftime('%H:%M')}: {len(results)} tahta: {summarize(results)}")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,131 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from etap_ssh import AUTH_FAILED
+
+
+@dataclass
+class _Retry:
+    action: str
+    deadline: datetime
+    attempt: int = 0
+    next_at: float = 0.0
+
+
+class RetryQueue(threading.Thread):
+    """Başarısız kilitle/aç komutlarını süre sınırı içinde yeniden dener.
+
+    Her tahta için yalnızca son istenen işlem tutulur. Denemeler arası süre
+    üstel artar (base .. max_delay) ve rastgele dağıtılır; böylece aynı anda
+    düşen tahtalar aynı anda tekrar denenmez. deadline geçen kayıt (ör. ders
+    bitip teneffüs başladıysa kilit açma) bırakılır. Kimlik hatası tekrar
+    denenmez. Kapalı olduğu bilinen tahtalar izleyici (LivenessMonitor) onları
+    çevrimiçi görüp kick() çağrılana kadar denenmez.
+
+    dispatch(ips, action) BoardResult listesi döndürür; listede olmayan tahta
+    artık işlem gerektirmiyor sayılır.
+    """
+
+    def __init__(self, dispatch, monitor=None, on_result=None, base=2, max_delay=60):
+        super().__init__(daemon=True)
+        self.dispatch = dispatch
+        self.monitor = monitor
+        self.on_result = on_result
+        self.base = base
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._queue = {}
+        self._halt = threading.Event()
+        self._wake = threading.Event()
+
+    def submit(self, ips, action, deadline):
+        ips = list(ips)
+        if not ips or deadline <= datetime.now():
+            return
+        now = time.monotonic()
+        with self._lock:
+            for ip in ips:
+                entry = self._queue[ip] = _Retry(action, deadline)
+                entry.next_at = now + self._delay(0)
+        if self.monitor:
+            self.monitor.expedite(ips)
+        self._wake.set()
+
+    def discard(self, ips):
+        with self._lock:
+            gone = [ip for ip in ips if self._queue.pop(ip, None)]
+        if self.monitor and gone:
+            self.monitor.relax(gone)
+
+    def kick(self, ips):
+        # Tahta yeniden çevrimiçi: beklemeden dene
+        with self._lock:
+            for ip in ips:
+                if ip in self._queue:
+                    self._queue[ip].next_at = 0.0
+        self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return {ip: e.action for ip, e in self._queue.items()}
+
+    def run(self):
+        while not self._halt.is_set():
+            for action, batch in self._take_due().items():
+                try:
+                    results = self.dispatch(list(batch), action)
+                except Exception as e:
+                    print(f"Yeniden deneme hatası: {e}")
+                    results = []
+                self._settle(batch, results)
+                if self.on_result and results:
+                    self.on_result(action, results)
+            with self._lock:
+                next_at = min((e.next_at for e in self._queue.values()), default=None)
+            timeout = 5 if next_at is None else min(5, max(0.1, next_at - time.monotonic()))
+            if self._wake.wait(timeout):
+                self._wake.clear()
+
+    def _take_due(self):
+        now, mono = datetime.now(), time.monotonic()
+        due = {}
+        with self._lock:
+            expired = [ip for ip, e in self._queue.items() if e.deadline <= now]
+            for ip in expired:
+                del self._queue[ip]
+            for ip, e in self._queue.items():
+                if e.next_at <= mono and not (self.monitor and self.monitor.is_down(ip)):
+                    due.setdefault(e.action, {})[ip] = e
+        if self.monitor and expired:
+            self.monitor.relax(expired)
+        return due
+
+    def _settle(self, batch, results):
+        by_ip = {r.ip: r for r in results}
+        done = []
+        now = time.monotonic()
+        with self._lock:
+            for ip, entry in batch.items():
+                # Deneme sürerken yeni bir işlem istenmiş olabilir
+                if self._queue.get(ip) is not entry:
+                    continue
+                res = by_ip.get(ip)
+                if res is None or res.ok or res.status == AUTH_FAILED:
+                    del self._queue[ip]
+                    done.append(ip)
+                else:
+                    entry.attempt += 1
+                    entry.next_at = now + self._delay(entry.attempt)
+        if self.monitor and done:
+            self.monitor.relax(done)
+
+    def _delay(self, attempt):
+        delay = min(self.max_delay, self.base * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def stop(self):
+        self._halt.set()
+        self._wake.set()
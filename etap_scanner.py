@@ -0,0 +1,263 @@
+import errno
+import ipaddress
+import re
+import selectors
+import socket
+import time
+from collections import OrderedDict
+
+from etap_metrics import METRICS
+
+# Bağlantı denemesi "devam ediyor" anlamına gelen hata kodları
+_IN_PROGRESS = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+
+def split_address(addr, default_port=22):
+    # Tahta adresi "10.46.197.21" ya da (benzetici için) "127.0.0.1:2201"
+    host, sep, port = addr.rpartition(":")
+    return (host, int(port)) if sep else (addr, default_port)
+
+
+def check_address(addr):
+    # Envantere yalnızca geçerli tahta adresi girer; address_key ve taramalar buna güvenir
+    try:
+        host, port = split_address(addr)
+        ipaddress.IPv4Address(host)
+        if not 0 < port < 65536:
+            raise ValueError(port)
+    except ValueError:
+        raise ValueError(f"geçersiz tahta adresi: {addr!r}") from None
+    return addr
+
+
+def address_key(addr):
+    # Adresleri sayısal sıralamak için: 10.0.0.9 < 10.0.0.10, aynı IP'de port sırası
+    host, port = split_address(addr, 0)
+    return tuple(int(p) for p in host.split(".")), port
+
+
+def _merge(intervals):
+    merged = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return merged
+
+
+def _parse_item(item):
+    # "a.b.c" (eski panel biçimi) -> a.b.c.0/24
+    if re.fullmatch(r"\d+\.\d+\.\d+", item):
+        item += ".0/24"
+    if "-" in item:
+        lo, hi = (int(ipaddress.IPv4Address(p.strip())) for p in item.split("-", 1))
+        if lo > hi:
+            raise ValueError(f"Geçersiz aralık: {item}")
+        return lo, hi
+    net = ipaddress.IPv4Network(item, strict=False)
+    lo, hi = int(net.network_address), int(net.broadcast_address)
+    # /31 ve /32 dışında ağ ve yayın adresleri taranmaz
+    if net.prefixlen < 31:
+        lo, hi = lo + 1, hi - 1
+    return lo, hi
+
+
+class TargetSet:
+    """CIDR/aralık listesinden (hariç tutmalar düşülmüş) taranacak adresler."""
+
+    def __init__(self, include, exclude=()):
+        ranges = []
+        exclude = _merge(exclude)
+        for lo, hi in _merge(include):
+            for ex_lo, ex_hi in exclude:
+                if ex_hi < lo or ex_lo > hi:
+                    continue
+                if ex_lo > lo:
+                    ranges.append((lo, ex_lo - 1))
+                lo = ex_hi + 1
+                if lo > hi:
+                    break
+            if lo <= hi:
+                ranges.append((lo, hi))
+        self.ranges = ranges
+
+    @classmethod
+    def parse(cls, text):
+        # Örn: "10.46.196.0/22, 10.47.10.0/24 !10.46.196.1 !10.46.197.200-10.46.197.254"
+        include, exclude = [], []
+        for item in re.split(r"[\s,;]+", text.strip()):
+            if not item:
+                continue
+            target = exclude if item.startswith("!") else include
+            try:
+                target.append(_parse_item(item.lstrip("!")))
+            except ValueError:
+                raise ValueError(f"Geçersiz ağ tanımı: {item}") from None
+        if not include:
+            raise ValueError("Taranacak ağ belirtilmedi.")
+        return cls(include, exclude)
+
+    def without(self, ips):
+        # Bilinen tahtalar düşülmüş yeni hedef kümesi (artımlı tarama için)
+        return TargetSet(self.ranges, [(n, n) for n in (int(ipaddress.IPv4Address(split_address(ip)[0])) for ip in ips)])
+
+    def __len__(self):
+        return sum(hi - lo + 1 for lo, hi in self.ranges)
+
+    def __iter__(self):
+        for lo, hi in self.ranges:
+            for n in range(lo, hi + 1):
+                yield str(ipaddress.IPv4Address(n))
+
+    def __contains__(self, ip):
+        n = int(ipaddress.IPv4Address(ip))
+        return any(lo <= n <= hi for lo, hi in self.ranges)
+
+
+ARP_TABLE = "/proc/net/arp"
+
+
+def neighbor_hosts(path=ARP_TABLE):
+    # Çekirdeğin ARP tablosunda MAC adresi çözülmüş (ağda görülmüş) IPv4 komşular
+    hosts = []
+    try:
+        with open(path, encoding="ascii", errors="replace") as f:
+            next(f, None)
+            for line in f:
+                parts = line.split()
+                if len(parts) < 4:
+                    continue
+                ip, flags, mac = parts[0], parts[2], parts[3]
+                if int(flags, 16) & 0x2 and mac != "00:00:00:00:00:00":
+                    hosts.append(ip)
+    except (OSError, ValueError):
+        pass
+    return hosts
+
+
+def passive_candidates(targets, known=(), path=ARP_TABLE):
+    # Hedef ağlardaki, henüz bilinmeyen komşular: aktif taramadan önce yoklanır
+    known = set(known)
+    return [ip for ip in neighbor_hosts(path) if ip not in known and ip in targets]
+
+
+class NetworkScanner:
+    """Bloklamayan connect() ile aynı anda yüzlerce port 22 yoklaması yapar."""
+
+    def __init__(self, port=22, timeout=0.35, concurrency=256, retries=1, batch_interval=0.1, metrics=METRICS):
+        self.port = port
+        self.metrics = metrics
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.batch_interval = batch_interval
+
+    def scan(self, hosts, on_found=None, on_progress=None, on_batch=None):
+        # hosts: liste ya da TargetSet; büyük ağlarda adresler tembel üretilir
+        total = len(hosts) or 1
+        state = {"done": 0, "pct": -1}
+        batch = []
+        flushed = [time.monotonic()]
+
+        def flush(force=False):
+            now = time.monotonic()
+            if batch and on_batch and (force or now - flushed[0] >= self.batch_interval):
+                on_batch(list(batch))
+                batch.clear()
+                flushed[0] = now
+
+        def found_one(host):
+            if on_found:
+                on_found(host)
+            batch.append(host)
+
+        def progress(n):
+            state["done"] += n
+            pct = int(state["done"] / total * 100)
+            if on_progress and pct != state["pct"]:
+                state["pct"] = pct
+                on_progress(pct)
+
+        found = []
+        pending = hosts
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            # Zaman aşımına uğrayanlar (SYN kaybı olabilir) bir tur daha denenir;
+            # reddedenler ve cevap verenler kesin sonuçtur.
+            pending = self._sweep(pending, found, found_one, progress, flush, last)
+            if not pending:
+                break
+        flush(force=True)
+        return found
+
+    def _sweep(self, hosts, found, on_found, progress, flush, last):
+        sel = selectors.DefaultSelector()
+        # Tüm denemeler aynı timeout ile açıldığı için son tarihler ekleme
+        # sırasına göre artar; en eskisi her zaman baştadır.
+        inflight = OrderedDict()
+        timed_out = []
+        it = iter(hosts)
+        exhausted = False
+        # Gösterge tüm taramaların toplamıdır (izleme ve panel taraması aynı
+        # anda sürebilir): yalnızca bu taramanın farkı eklenir
+        reported = 0
+
+        def finish(sock):
+            sel.unregister(sock)
+            sock.close()
+            del inflight[sock]
+
+        try:
+            while True:
+                while not exhausted and len(inflight) < self.concurrency:
+                    host = next(it, None)
+                    if host is None:
+                        exhausted = True
+                        break
+                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    s.setblocking(False)
+                    if s.connect_ex(split_address(host, self.port)) in _IN_PROGRESS:
+                        sel.register(s, selectors.EVENT_WRITE)
+                        inflight[s] = (host, time.monotonic() + self.timeout)
+                    else:
+                        s.close()
+                        self.metrics.inc("etap_scan_probes_total", result="closed")
+                        progress(1)
+                self.metrics.add("etap_scan_inflight", len(inflight) - reported)
+                reported = len(inflight)
+
+                if not inflight:
+                    break
+
+                first_deadline = next(iter(inflight.values()))[1]
+                for key, _ in sel.select(max(0.0, first_deadline - time.monotonic())):
+                    s = key.fileobj
+                    host, deadline = inflight[s]
+                    ok = s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+                    finish(s)
+                    self.metrics.inc("etap_scan_probes_total", result="open" if ok else "closed")
+                    if ok:
+                        self.metrics.observe("etap_scan_connect_seconds", time.monotonic() - deadline + self.timeout)
+                        found.append(host)
+                        on_found(host)
+                    progress(1)
+
+                now = time.monotonic()
+                while inflight:
+                    s, (host, deadline) = next(iter(inflight.items()))
+                    if deadline > now:
+                        break
+                    finish(s)
+                    self.metrics.inc("etap_scan_probes_total", result="timeout")
+                    if last:
+                        progress(1)
+                    else:
+                        timed_out.append(host)
+                flush()
+        finally:
+            for s in list(inflight):
+                finish(s)
+            sel.close()
+            self.metrics.add("etap_scan_inflight", -reported)
+        return timed_out
@@ -0,0 +1,292 @@
+import hashlib
+import json
+import re
+import threading
+from bisect import bisect_right
+from datetime import datetime, time as dtime, timedelta
+
+DAYS = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"]
+ACTIONS = ("lock", "unlock")
+
+# Eski program.json dosyalarında "08.50" biçimi de var
+_TIME_RE = re.compile(r"([01]?\d|2[0-3])[:.]([0-5]\d)")
+
+
+class ScheduleError(ValueError):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("\n".join(errors))
+
+
+def parse_time(text):
+    m = _TIME_RE.fullmatch(str(text).strip())
+    if not m:
+        raise ValueError(f"geçersiz saat {text!r} (SS:DD olmalı)")
+    return int(m.group(1)) * 60 + int(m.group(2))
+
+
+def schedule_digest(data):
+    # Gün/alan sırasından bağımsız içerik özeti (tahtalarla eşitlik kontrolü)
+    text = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def schedule_diff(old, new):
+    # Yalnızca değişen günler; silinen gün None
+    diff = {day: slots for day, slots in new.items() if old.get(day) != slots}
+    diff.update({day: None for day in old if day not in new})
+    return diff
+
+
+def _json_size(obj):
+    return len(json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode())
+
+
+def split_days(days, limit):
+    # Günleri (gerekirse bir günün dilimlerini) JSON boyutu yaklaşık limit
+    # baytı aşmayan parçalara böler; merge_days parçaları sırayla birleştirir
+    parts, part, size = [], {}, 2
+    for day, slots in days.items():
+        head = _json_size(day) + 3
+        for slot in [None] if not slots else slots:
+            need = (0 if day in part else head) + (_json_size(slot) + 1 if slot else 4)
+            if part and size + need > limit:
+                parts.append(part)
+                part, size = {}, 2
+                need = head + (_json_size(slot) + 1 if slot else 4)
+            if slot is None:
+                part[day] = slots
+            else:
+                part.setdefault(day, []).append(slot)
+            size += need
+    parts.append(part)
+    return parts
+
+
+def merge_days(parts):
+    out = {}
+    for part in parts:
+        for day, slots in part.items():
+            if slots is None:
+                out[day] = None
+            else:
+                out.setdefault(day, []).extend(slots)
+    return out
+
+
+def apply_diff(data, diff):
+    out = dict(data)
+    for day, slots in diff.items():
+        if slots is None:
+            out.pop(day, None)
+        else:
+            out[day] = slots
+    return out
+
+
+class CompiledSchedule:
+    """program.json'un gün başına sıralı dakika aralıklarına derlenmiş hali.
+
+    Dilimler [başlangıç, bitiş) yarı açık aralıklardır; bir dilimin bittiği
+    dakikada başlayan dilim geçerli olur. Arama bisect ile O(log n)'dir.
+    "group" alanı olan dilimler yalnızca o gruba (etiket, "kat:2" ...)
+    uygulanır; her grubun programı ayrı derlenir, çakışma grup içinde aranır.
+    Grup dilimi bittiğinde grup, sürmekte olan tüm okul dilimine döner.
+    """
+
+    def __init__(self, days, errors=(), groups=None):
+        # days[gün_no] = (başlangıçlar, bitişler, dilimler) — başlangıca göre sıralı
+        # groups[grup] aynı yapıda; None anahtarı tüm okul programıdır
+        self.groups = groups if groups is not None else {None: days}
+        self.days = self.groups.get(None, {})
+        self.errors = list(errors)
+
+    @classmethod
+    def compile(cls, data, strict=True):
+        errors = []
+        groups = {}
+        for name, slots in data.items():
+            if name not in DAYS:
+                errors.append(f"{name}: bilinmeyen gün")
+                continue
+            parsed = {}
+            for row, s in enumerate(slots, 1):
+                where = f"{name} satır {row}"
+                try:
+                    start, end = parse_time(s["start"]), parse_time(s["end"])
+                except KeyError as e:
+                    errors.append(f"{where}: {e.args[0]} alanı eksik")
+                    continue
+                except ValueError as e:
+                    errors.append(f"{where}: {e}")
+                    continue
+                if s.get("action") not in ACTIONS:
+                    errors.append(f"{where}: geçersiz işlem {s.get('action')!r}")
+                    continue
+                if start >= end:
+                    errors.append(f"{where}: bitiş ({s['end']}) başlangıçtan ({s['start']}) sonra olmalı")
+                    continue
+                group = s.get("group") or None
+                if group is not None and not isinstance(group, str):
+                    errors.append(f"{where}: geçersiz grup {group!r}")
+                    continue
+                parsed.setdefault(group, []).append((start, end, row, s["action"]))
+            for group, rows in parsed.items():
+                rows.sort()
+                kept = []
+                for start, end, row, action in rows:
+                    if kept and start < kept[-1][1]:
+                        errors.append(f"{name} satır {row}: satır {kept[-1][2]} ile çakışıyor")
+                        continue
+                    kept.append((start, end, row, action))
+                slots_out = []
+                for k in kept:
+                    slot = {"start": f"{k[0] // 60:02d}:{k[0] % 60:02d}", "end": f"{k[1] // 60:02d}:{k[1] % 60:02d}", "action": k[3]}
+                    if group:
+                        slot["group"] = group
+                    slots_out.append(slot)
+                groups.setdefault(group, {})[DAYS.index(name)] = ([k[0] for k in kept], [k[1] for k in kept], slots_out)
+        if errors and strict:
+            raise ScheduleError(errors)
+        return cls(groups.get(None, {}), errors, groups)
+
+    def group_names(self):
+        return sorted(g for g in self.groups if g)
+
+    def slot_at(self, now, group=None):
+        starts, ends, slots = self.groups.get(group, {}).get(now.weekday(), ((), (), ()))
+        cur = now.hour * 60 + now.minute
+        i = bisect_right(starts, cur) - 1
+        if i >= 0 and cur < ends[i]:
+            return slots[i]
+        return None
+
+    def slots_at(self, now):
+        # Tüm okul dilimi önce: aynı anda başlayan grup dilimi onu geçersiz kılar
+        found = [self.slot_at(now, g) for g in [None] + self.group_names()]
+        return [slot for slot in found if slot]
+
+    def slot_end(self, now, group=None):
+        # O anki dilimin bittiği an (datetime); dilim yoksa None
+        slot = self.slot_at(now, group)
+        if slot is None:
+            return None
+        end = parse_time(slot["end"])
+        return datetime.combine(now.date(), dtime(end // 60, end % 60))
+
+    def reverts_at(self, now):
+        # Bu dakikada biten grup dilimleri: grupta yeni dilim başlamıyorsa ve
+        # tüm okul dilimi sürüyorsa grubun üyelerine o dilim yeniden uygulanır
+        whole = self.slot_at(now)
+        hhmm = f"{now.hour:02d}:{now.minute:02d}"
+        if whole is None or whole["start"] == hhmm:
+            return []
+        cur = now.hour * 60 + now.minute
+        out = []
+        for group in self.group_names():
+            _, ends, _ = self.groups[group].get(now.weekday(), ((), (), ()))
+            if cur in ends and self.slot_at(now, group) is None:
+                out.append(dict(whole, group=group))
+        return out
+
+    def next_transition(self, now):
+        # Şu andan sonraki ilk geçiş (tüm gruplar): (datetime, slot). Grup
+        # dilimlerinin bitişi de geçiştir; grup tüm okul programına döner.
+        found = [nxt for nxt in (self._next(days, now, ends=group is not None)
+                                 for group, days in self.groups.items()) if nxt]
+        return min(found, key=lambda nxt: nxt[0]) if found else None
+
+    @staticmethod
+    def _next(days, now, ends=False):
+        cur = now.hour * 60 + now.minute
+        for offset in range(8):
+            day = now.date() + timedelta(days=offset)
+            starts, stops, slots = days.get(day.weekday(), ((), (), ()))
+            marks = sorted([(start, slot) for start, slot in zip(starts, slots)]
+                           + ([(stop, slot) for stop, slot in zip(stops, slots)] if ends else []),
+                           key=lambda mark: mark[0])
+            i = bisect_right([m for m, _ in marks], cur) if offset == 0 else 0
+            if i < len(marks):
+                minute, slot = marks[i]
+                return datetime.combine(day, dtime(minute // 60, minute % 60)), slot
+        return None
+
+
+class BellScheduler(threading.Thread):
+    """Zil modunu GUI iş parçacığının dışında, yalnızca geçiş anlarında uygular.
+
+    Bir sonraki zil zamanı derlenmiş programdan hesaplanır ve o ana kadar
+    uyunur; her geçişte dalga bir kez gönderilir. Program değişince reload()
+    çağrılır. get_schedule / get_targets o anki CompiledSchedule'ı ve tahta
+    listesini döndürür, dispatch(ips, action) SSH dalgasını çalıştırır;
+    sonuçlar on_wave ile (Qt tarafında bir sinyal) bildirilir. Grup dilimleri
+    resolve_group(grup) ile çözülür ve dispatch'e group= ile verilir;
+    resolve_group yoksa grup dilimleri uygulanmaz.
+    """
+
+    def __init__(self, get_schedule, get_targets, dispatch, on_wave=None, max_sleep=60, resolve_group=None):
+        super().__init__(daemon=True)
+        self.get_schedule = get_schedule
+        self.get_targets = get_targets
+        self.dispatch = dispatch
+        self.on_wave = on_wave
+        self.resolve_group = resolve_group
+        # Saat ileri/geri alınırsa (NTP, uyku) hedef en geç bu kadar saniyede
+        # yeniden kontrol edilir; ağ trafiği oluşturmaz.
+        self.max_sleep = max_sleep
+        self._halt = threading.Event()
+        self._wake = threading.Event()
+
+    def run(self):
+        # Açılışta ve program değiştiğinde o anki dilimler bir kez uygulanır
+        self._fire(self.get_schedule().slots_at(datetime.now()))
+        while not self._halt.is_set():
+            nxt = self.get_schedule().next_transition(datetime.now())
+            woken = False
+            while True:
+                now = datetime.now()
+                if nxt and now >= nxt[0]:
+                    break
+                timeout = self.max_sleep if nxt is None else min(self.max_sleep, (nxt[0] - now).total_seconds())
+                if self._wake.wait(timeout):
+                    self._wake.clear()
+                    woken = True
+                    break
+            if self._halt.is_set():
+                return
+            # Geç uyanıldıysa (uyku vb.) eski geçiş değil o anki dilimler uygulanır;
+            # zamanında uyanıldıysa yalnızca bu anda başlayan dilimler ve bu anda
+            # biten grup dilimlerinin yerine geçen tüm okul dilimi
+            now = datetime.now()
+            schedule = self.get_schedule()
+            slots = schedule.slots_at(now)
+            if not woken and nxt and (now - nxt[0]).total_seconds() < self.max_sleep:
+                hhmm = nxt[0].strftime("%H:%M")
+                slots = [slot for slot in slots if slot["start"] == hhmm] + schedule.reverts_at(nxt[0])
+            self._fire(slots)
+
+    def _fire(self, slots):
+        for slot in slots:
+            group = slot.get("group")
+            try:
+                if group:
+                    if not self.resolve_group:
+                        continue
+                    ips = list(self.resolve_group(group))
+                else:
+                    ips = list(self.get_targets())
+                if not ips:
+                    continue
+                results = self.dispatch(ips, slot["action"], group=group) if group else self.dispatch(ips, slot["action"])
+            except Exception as e:
+                print(f"Zil hatası: {e}")
+                continue
+            if self.on_wave:
+                self.on_wave(slot["action"], results)
+
+    def reload(self):
+        self._wake.set()
+
+    def stop(self):
+        self._halt.set()
+        self._wake.set()
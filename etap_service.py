@@ -0,0 +1,424 @@
+import os
+import signal
+import sys
+import threading
+from datetime import datetime, timedelta
+
+from etap_beacon import BEACON_GROUP, BEACON_PORT, COMMANDS, PACKET_LIMIT, Beacon
+from etap_control import ControlServer
+from etap_data import DataManager
+from etap_health import LivenessMonitor, ONLINE
+from etap_journal import ActionJournal
+from etap_metrics import METRICS
+from etap_retry import RetryQueue
+from etap_scanner import NetworkScanner, TargetSet, passive_candidates, split_address
+from etap_schedule import DAYS, BellScheduler, CompiledSchedule, schedule_diff, schedule_digest, split_days
+from etap_ssh import CommandResult, FanOut, SSHPool, summarize, to_result
+from etap_state import BoardInventory, BoardStateTable
+
+DEFAULT_CONFIG = {"user": "etapadmin", "pass": "etap+pardus!", "ip_range": "10.46.197.0/24"}
+
+PID_FILE = "etap_servis.pid"
+
+
+def log(msg):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {msg}", flush=True)
+
+
+def running_pid(path=PID_FILE):
+    # Servis çalışıyorsa PID'ini döndürür
+    try:
+        with open(path) as f:
+            pid = int(f.read().strip())
+        os.kill(pid, 0)
+    except PermissionError:
+        # Servis kendi kullanıcısıyla (etapkilit) çalışıyor, panel normal kullanıcı
+        pass
+    except (OSError, ValueError):
+        return None
+    return pid if pid != os.getpid() else None
+
+
+class EtapService:
+    """Zil modu, keşif, canlılık izleme ve yeniden denemeyi Qt olmadan yürütür.
+
+    Hem arka plan servisi (main) hem de panel aynı çekirdeği kullanır. Panel
+    kendi tahta listesini ve parola alanlarını get_targets / get_credentials
+    ile verir; servis bunları ayarlar.json ve tahtalar.json'dan okur. Olaylar
+    on_wave(action, results), on_health(changes), on_retry(action, results),
+    on_found(ips) ve on_status(str) ile bildirilir.
+
+    ayarlar.json'da "beacon_key" varsa komutlar önce tek bir imzalı UDP
+    paketiyle (etap_beacon) gönderilir; SSH yalnızca onay vermeyen tahtalara
+    (ajanı olmayan ya da paketi kaçıran) uygulanır. Zil programı ajanlara
+    gönderilir (sync_schedule); programı güncel olan tahtalar zilleri kendisi
+    uygular ve zil anında bu tahtalara hiç paket gitmez.
+    """
+
+    def __init__(self, get_targets=None, get_credentials=None, on_wave=None, on_health=None,
+                 on_retry=None, on_found=None, on_status=None):
+        self.config = DataManager.load_json(DataManager.SETTINGS_FILE, dict(DEFAULT_CONFIG))
+        self.schedule = DataManager.load_json(DataManager.SCHEDULE_FILE, {day: [] for day in DAYS})
+        self.compiled = CompiledSchedule.compile(self.schedule, strict=False)
+        self.inventory = BoardInventory()
+        self.ssh_pool = SSHPool(connect_timeout=4, command_timeout=self.config.get("command_timeout", 10),
+                                max_connections=self.config.get("ssh_pool_size", 256))
+        self.fanout = FanOut(workers=self.config.get("manage_workers", 32), deadline=self.config.get("manage_deadline", 15))
+        # Son bilinen tahta durumları: aynı komut tekrar tekrar gönderilmez
+        self.states = BoardStateTable(max_age=self.config.get("state_max_age", 3600))
+        # Kim, hangi tahtayı, ne zaman, hangi sonuçla: islem_gunlugu.jsonl
+        self.journal = ActionJournal(
+            self.config.get("journal_file", DataManager.JOURNAL_FILE),
+            max_bytes=self.config.get("journal_max_bytes", 5 * 1024 * 1024), keep=self.config.get("journal_keep", 30))
+        self.beacon = self._make_beacon()
+        # ip -> ajanın bildirdiği program özeti; taban: en son gönderilen program
+        self.synced = {}
+        self._pushed = DataManager.load_json(DataManager.SYNCED_FILE, None)
+        self._sync_lock = threading.Lock()
+        self.get_targets = get_targets or self.inventory.ips
+        self.get_credentials = get_credentials or (lambda: (self.config["user"], self.config["pass"]))
+        self.on_wave = on_wave
+        self.on_health = on_health
+        self.on_retry = on_retry
+        self.on_found = on_found
+        self.on_status = on_status
+
+        self._build_workers()
+
+    def _build_workers(self):
+        # İş parçacıkları yeniden başlatılamaz; suspend() sonrası start() yenilerini kurar
+        # Canlılık izleme: kapalı tahtalar zil dalgasında beklenmez
+        self.monitor = LivenessMonitor(
+            self.get_targets, self._health_changed,
+            interval=self.config.get("health_interval", 30), max_backoff=self.config.get("health_max_backoff", 120))
+        # Başarısız komutlar o anki dilim bitene kadar yeniden denenir
+        self.retry = RetryQueue(self.dispatch, self.monitor, self.on_retry, max_delay=self.config.get("retry_max_delay", 60))
+        self.bell = BellScheduler(lambda: self.compiled, self.get_targets, self.run_wave, self.on_wave, resolve_group=self.group)
+        self._halt = threading.Event()
+
+    def start(self, scheduler=True):
+        # scheduler=False: zil modunu başka bir süreç (servis) yürütüyor
+        if self._halt.is_set():
+            self._build_workers()
+        if self.monitor.is_alive():
+            return
+        self.monitor.start()
+        if scheduler:
+            self.start_scheduler()
+        threading.Thread(target=self._discovery_loop, daemon=True).start()
+
+    def start_scheduler(self):
+        if not self.bell.is_alive():
+            self.retry.start()
+            self.bell.start()
+            threading.Thread(target=self._metrics_loop, daemon=True).start()
+            threading.Thread(target=self._sync_loop, daemon=True).start()
+
+    def suspend(self):
+        # Zil, izleme, keşif ve yeniden deneme durur (işi başka süreç devraldı);
+        # SSH havuzu ve işlem günlüğü açık kalır, start() ile yeniden başlar
+        self._halt.set()
+        self.bell.stop()
+        self.retry.stop()
+        self.monitor.stop()
+        # Ertelenmiş durum/envanter kayıtları diske yazılır; devralan süreç okur
+        DataManager.flush()
+
+    def stop(self):
+        self.suspend()
+        self.ssh_pool.close_all()
+        self.journal.close()
+
+    def reload(self):
+        # Panel kayıt yaptığında (SIGHUP) ayarlar ve program diskten yeniden okunur
+        self.config.update(DataManager.load_json(DataManager.SETTINGS_FILE, {}))
+        self.schedule = DataManager.load_json(DataManager.SCHEDULE_FILE, self.schedule)
+        self.compiled = CompiledSchedule.compile(self.schedule, strict=False)
+        self.inventory.reload()
+        self.beacon = self._make_beacon()
+        self.schedule_changed()
+        return self.compiled.errors
+
+    def schedule_changed(self):
+        self.bell.reload()
+        if self.beacon:
+            threading.Thread(target=self.sync_schedule, daemon=True).start()
+
+    def boards_seen(self, ips, replace=False):
+        # Taramada bulunan tahtalar envantere, dolayısıyla zil ve izleme
+        # hedeflerine eklenir; replace: tam tarama, görülmeyenler çıkar
+        if replace:
+            self.inventory.replace(ips)
+        else:
+            self.inventory.seen(ips)
+
+    def clear_boards(self):
+        self.inventory.clear()
+        self.states.forget()
+
+    def execute(self, ip, action):
+        user, password = self.get_credentials()
+        return self.ssh_pool.run(ip, user, password, COMMANDS[action])
+
+    def apply(self, ips, action, force=False, on_result=None, source="elle"):
+        # Elle / API ile verilen toplu komut: (sonuçlar, atlanan tahta sayısı)
+        ips = list(dict.fromkeys(ips))
+        targets = self.states.pending(ips, action, force=force)
+        results = self.run(targets, action, on_result)
+        self.states.record(results, action)
+        self.journal.log(results, action, source)
+        self.monitor.observe(results)
+        # Elle verilen komut, kuyruktaki eski zil işleminin önüne geçer
+        self.retry.discard(ips)
+        if self.bell.is_alive():
+            self.retry.submit([r.ip for r in results if not r.ok], action, self.retry_deadline())
+        return results, len(ips) - len(targets)
+
+    def group(self, name):
+        # Önce tahta kaydındaki etiketler ("kat:2", "oda:B12", "fen"), sonra
+        # ayarlar.json: "groups": {"1. kat": "10.46.197.10-10.46.197.40", ...}
+        if name == "all":
+            return list(self.get_targets())
+        members = self.inventory.members(name)
+        if members is not None:
+            return members
+        expr = self.config.get("groups", {}).get(name)
+        if expr is None:
+            raise ValueError(f"bilinmeyen grup: {name}")
+        members = TargetSet.parse(expr)
+        return [ip for ip in self.get_targets() if split_address(ip)[0] in members]
+
+    def run(self, targets, action, on_result=None, everyone=False):
+        # Önce UDP paketi; onay veren tahtalar için SSH bağlantısı hiç açılmaz.
+        # "ip:port" adresleri (benzetici) yalnızca SSH ile yönetilir.
+        results = []
+        if self.beacon and targets:
+            try:
+                acks = self.beacon.send(action, [ip for ip in targets if ":" not in ip], everyone)
+            except OSError as e:
+                self._status(f"UDP komutu gönderilemedi: {e}")
+                acks = {}
+            for ip, ack in acks.items():
+                out = CommandResult(ack.get("exit_code", -1), ack.get("stdout", ""), ack.get("stderr", ""))
+                res = to_result(ip, out, ack["elapsed"])
+                results.append(res)
+                if on_result:
+                    on_result(res)
+            targets = [ip for ip in targets if ip not in acks]
+        return results + self.fanout.run(targets, lambda ip: self.execute(ip, action), on_result)
+
+    def dispatch(self, ips, action, source="yeniden deneme", everyone=False):
+        targets = self.states.pending(ips, action)
+        # Hedefsiz paketi her ajan uygular: zaten uygun durumda olan tahta
+        # varsa yalnızca hedeflenen tahtalara gönderilir
+        everyone = everyone and len(targets) == len(set(ips))
+        results = self.run(targets, action, everyone=everyone)
+        self.states.record(results, action)
+        self.journal.log(results, action, source)
+        self.monitor.observe(results)
+        return results
+
+    def run_wave(self, ips, action, group=None):
+        # Kapalı olduğu bilinen tahtalar için süre aşımı beklenmez; bunlar ve
+        # başarısız olanlar dilim sonuna kadar yeniden deneme kuyruğunda kalır
+        deadline = self.retry_deadline(group)
+        down = [ip for ip in ips if self.monitor.is_down(ip)]
+        skip = set(down)
+        if self.beacon and self.config.get("local_bells", True) and group is None:
+            # Programı güncel tahtalar tüm okul zilini kendisi uygular (grup
+            # dilimlerini ajan çözemez, onları servis gönderir)
+            digest = schedule_digest(self.schedule)
+            local = {ip for ip in ips if self.synced.get(ip) == digest}
+            if local:
+                self._status(f"{len(local)} tahta zili yerel programla uyguluyor.")
+            skip |= local
+            self.states.expect(local, action)
+            down = [ip for ip in down if ip not in local]
+        # Tüm okul zilinde atlanan tahta yoksa hedef listesi gönderilmez: tek
+        # paket tüm okula gider. Yerel zilli ya da kapalı tahta varsa paket
+        # hedefli gider; yoksa onlar da komutu (ikinci kez) uygulardı.
+        source = f"zil:{group}" if group else "zil"
+        results = self.dispatch([ip for ip in ips if ip not in skip], action, source=source, everyone=group is None and not skip)
+        self.states.pending(down, action)
+        self.retry.submit(down + [r.ip for r in results if not r.ok], action, deadline)
+        return results
+
+    def sync_schedule(self, full=False):
+        # Programı güncel olmayan ajanlara gönderir. Taban sürümü tutan tahtalara
+        # yalnızca değişen günler gider; tabanı farklı olanlar tam programı alır.
+        if not self.beacon:
+            return self.sync_report()
+        with self._sync_lock:
+            schedule = self.schedule
+            digest = schedule_digest(schedule)
+            targets = [ip for ip in self.get_targets() if ":" not in ip]
+            stale = [ip for ip in targets if self.synced.get(ip) != digest]
+            try:
+                if stale and self._pushed is not None and not full:
+                    base = schedule_digest(self._pushed)
+                    self._push(stale, len(stale) == len(targets), schedule_diff(self._pushed, schedule), digest, base)
+                    stale = [ip for ip in stale if self.synced.get(ip) != digest]
+                if stale:
+                    self._push(stale, len(stale) == len(targets), schedule, digest)
+            except (OSError, ValueError) as e:
+                self._status(f"Program gönderilemedi: {e}")
+                return self.sync_report()
+            if self._pushed != schedule:
+                self._pushed = schedule
+                DataManager.save_json(DataManager.SYNCED_FILE, schedule)
+        return self.sync_report()
+
+    def _push(self, targets, everyone, days, digest, base=None):
+        # Günler tek pakete sığan parçalarla gider (IP parçalanması yok); hedef
+        # listesine de yer kalsın diye parça paket sınırının yarısıdır. Bir
+        # parçayı onaylamayan tahta sonrakileri almaz, bir sonraki eşitlemede
+        # yeniden dener.
+        parts = split_days(days, PACKET_LIMIT // 2)
+        for i, part in enumerate(parts):
+            extra = {"digest": digest, "part": i, "parts": len(parts), "days": part}
+            if base:
+                extra["base"] = base
+            acks = self.beacon.send("sync", targets, everyone=everyone, extra=extra)
+            self._record_sync(acks)
+            targets = [ip for ip in targets if acks.get(ip, {}).get("exit_code") == 0]
+            everyone = False
+            if not targets:
+                return
+
+    def verify_sync(self):
+        # Ajanlara program özetlerini sorar; yanıt vermeyenler bilinmiyor sayılır
+        if not self.beacon:
+            return self.sync_report()
+        targets = [ip for ip in self.get_targets() if ":" not in ip]
+        try:
+            acks = self.beacon.send("status", targets, everyone=True)
+        except OSError as e:
+            self._status(f"Program durumu sorulamadı: {e}")
+            return self.sync_report()
+        with self._sync_lock:
+            for ip in targets:
+                if ip not in acks:
+                    self.synced.pop(ip, None)
+            self._record_sync(acks)
+        return self.sync_report()
+
+    def sync_report(self):
+        digest = schedule_digest(self.schedule)
+        report = {"digest": digest, "synced": [], "stale": [], "unknown": []}
+        for ip in self.get_targets():
+            have = self.synced.get(ip)
+            report["unknown" if have is None else "synced" if have == digest else "stale"].append(ip)
+        return report
+
+    def _record_sync(self, acks):
+        for ip, ack in acks.items():
+            if ack.get("digest"):
+                self.synced[ip] = ack["digest"]
+
+    def retry_deadline(self, group=None):
+        # Yeniden deneme o anki dilimin sonunda (dilim yoksa bir sonraki zilde) biter
+        now = datetime.now()
+        end = self.compiled.slot_end(now, group)
+        if end is None:
+            nxt = self.compiled.next_transition(now)
+            end = nxt[0] if nxt else now + timedelta(hours=1)
+        return end
+
+    def passive_discovery(self):
+        try:
+            hosts = TargetSet.parse(self.config["ip_range"])
+        except ValueError:
+            return []
+        scanner = NetworkScanner(concurrency=self.config.get("scan_concurrency", 256))
+        found = scanner.scan(passive_candidates(hosts, self.inventory.ips()), on_batch=self.on_found)
+        if found:
+            self.inventory.seen(found)
+            self._status(f"Komşu tablosundan {len(found)} yeni tahta eklendi.")
+        return found
+
+    def _discovery_loop(self):
+        # Komşu (ARP) tablosundaki tahtalar hiç tarama yapmadan listeye eklenir
+        while True:
+            self.passive_discovery()
+            if self._halt.wait(self.config.get("discovery_interval", 600)):
+                return
+
+    def _make_beacon(self):
+        key = self.config.get("beacon_key")
+        if not key:
+            return None
+        return Beacon(
+            key, self.config.get("beacon_group", BEACON_GROUP), self.config.get("beacon_port", BEACON_PORT),
+            wait=self.config.get("beacon_wait", 1.0), interface=self.config.get("beacon_interface"))
+
+    def _sync_loop(self):
+        # Yeni açılan / yeniden kurulan tahtalar programı en geç sync_interval sonra alır
+        while True:
+            if self.beacon:
+                self.verify_sync()
+                self.sync_schedule()
+            if self._halt.wait(self.config.get("sync_interval", 300)):
+                return
+
+    def _metrics_loop(self):
+        # node_exporter textfile toplayıcısı ve diğer araçlar için
+        while not self._halt.wait(self.config.get("metrics_interval", 15)):
+            try:
+                METRICS.export(self.config.get("metrics_prom", "etap_metrics.prom"), self.config.get("metrics_json", "etap_metrics.json"))
+            except OSError as e:
+                self._status(f"Ölçümler yazılamadı: {e}")
+
+    def _health_changed(self, changes):
+        self.retry.kick([ip for ip, status in changes if status == ONLINE])
+        if self.on_health:
+            self.on_health(changes)
+
+    def _status(self, msg):
+        if self.on_status:
+            self.on_status(msg)
+
+
+def main():
+    # Masaüstü oturumu gerektirmez: systemd ile (etap-kilit.service) çalıştırılır.
+    # Panel ve betikler etap_kontrol.sock üzerinden bağlanır (etap_control.py).
+    if len(sys.argv) > 1:
+        os.chdir(sys.argv[1])
+    pid = running_pid()
+    if pid:
+        log(f"Servis zaten çalışıyor (PID {pid}).")
+        sys.exit(1)
+
+    def on_wave(action, results):
+        label = "Kilitleme" if action == "lock" else "Kilit açma"
+        log(f"Zil ({label}): {summarize(results) if results else 'tüm tahtalar zaten uygun durumda'}")
+
+    service = EtapService(
+        on_wave=on_wave,
+        on_retry=lambda action, results: log(f"Yeniden deneme ({action}): {summarize(results)}"),
+        on_status=log)
+    if service.compiled.errors:
+        log(f"program.json: {len(service.compiled.errors)} hatalı kayıt yok sayıldı ({service.compiled.errors[0]})")
+
+    done = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *a: done.set())
+    signal.signal(signal.SIGINT, lambda *a: done.set())
+    signal.signal(signal.SIGHUP, lambda *a: log(f"Yeniden yüklendi ({len(service.reload())} hatalı kayıt)."))
+
+    with open(PID_FILE, "w") as f:
+        f.write(str(os.getpid()))
+    control = ControlServer(service, group=service.config.get("control_group"))
+    try:
+        service.start()
+        control.start()
+        log(f"Servis başladı: {len(service.inventory)} kayıtlı tahta.")
+        while not done.wait(1):
+            pass
+    finally:
+        control.stop()
+        service.stop()
+        os.remove(PID_FILE)
+        log("Servis durdu.")
+
+
+if __name__ == "__main__":
+    main()
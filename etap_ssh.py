@@ -0,0 +1,307 @@
+import socket
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Optional
+
+from etap_metrics import METRICS
+from etap_scanner import split_address
+
+OK = "ok"
+AUTH_FAILED = "auth"
+TIMEOUT = "timeout"
+REFUSED = "refused"
+EXIT_FAILED = "exit"
+ERROR = "error"
+
+STATUS_LABELS = {
+    OK: "başarılı",
+    AUTH_FAILED: "kimlik hatası",
+    TIMEOUT: "zaman aşımı",
+    REFUSED: "bağlantı reddedildi",
+    EXIT_FAILED: "komut başarısız",
+    ERROR: "hata",
+}
+
+
+# Komut çıktısından saklanan en fazla karakter
+OUTPUT_LIMIT = 300
+
+
+def _paramiko():
+    # paramiko (ve cryptography) ilk SSH bağlantısında yüklenir; panelin
+    # açılışı ve ajanla yapılan işlemler bu maliyeti ödemez
+    import paramiko
+    return paramiko
+
+
+@dataclass
+class CommandResult:
+    exit_code: int
+    stdout: str = ""
+    stderr: str = ""
+    elapsed: float = 0.0
+
+
+@dataclass
+class BoardResult:
+    ip: str
+    status: str
+    error: str = ""
+    elapsed: float = 0.0
+    exit_code: Optional[int] = None
+    output: str = ""
+
+    @property
+    def ok(self):
+        return self.status == OK
+
+
+def classify_error(exc):
+    # paramiko hiç yüklenmediyse hata ondan gelmiş olamaz
+    paramiko = sys.modules.get("paramiko")
+    if paramiko and isinstance(exc, paramiko.AuthenticationException):
+        return AUTH_FAILED
+    if isinstance(exc, (socket.timeout, TimeoutError)):
+        return TIMEOUT
+    if isinstance(exc, ConnectionRefusedError):
+        return REFUSED
+    return ERROR
+
+
+def summarize(results):
+    counts = Counter(r.status for r in results)
+    return ", ".join(f"{counts[s]} {STATUS_LABELS[s]}" for s in STATUS_LABELS if counts[s])
+
+
+def to_result(ip, out, elapsed):
+    # Sıfırdan farklı çıkış kodu EXIT_FAILED; negatif kod (sinyal, süre) hata
+    if not isinstance(out, CommandResult):
+        return BoardResult(ip, OK, elapsed=elapsed)
+    status = OK if out.exit_code == 0 else EXIT_FAILED if out.exit_code > 0 else ERROR
+    error = "" if status == OK else out.stderr or f"çıkış kodu {out.exit_code}"
+    return BoardResult(ip, status, error, elapsed, out.exit_code, out.stdout or out.stderr)
+
+
+class _Connection:
+    def __init__(self):
+        self.transport = None
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        # Havuzdan çıkarıldı (kimlik değişti); son komuttan sonra kapatılır
+        self.stale = False
+
+
+class SSHPool:
+    """Tahta başına kimliği doğrulanmış tek bir SSH transport'u tutar.
+
+    Elle yapılan işlemler ve zil dalgaları aynı oturumu paylaşır; her komut
+    yalnızca yeni bir kanal açar, TCP + anahtar değişimi + parola doğrulama
+    bağlantı kopmadıkça tekrarlanmaz. Her oturum bir soket ve bir iş parçacığı
+    tutar; havuz en çok max_connections oturumdur, aşılınca en uzun süredir
+    kullanılmayan boştaki oturum kapatılır.
+    """
+
+    def __init__(self, port=22, connect_timeout=5, command_timeout=10, keepalive=15, idle_timeout=300,
+                 max_connections=256, metrics=METRICS):
+        self.port = port
+        self.metrics = metrics
+        self.connect_timeout = connect_timeout
+        self.command_timeout = command_timeout
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        # En son kullanılan sonda
+        self._conns = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def run(self, ip, user, password, cmd):
+        conn = self._get(ip, user, password)
+        with conn.lock:
+            # Havuzdaki oturum sessizce kopmuş olabilir; bu durumda bir kez
+            # yeniden bağlanıp komutu tekrar deneriz.
+            for _ in range(2):
+                fresh = conn.transport is None or not conn.transport.is_active()
+                if fresh:
+                    self._close(conn)
+                    conn.transport = self._connect(ip, user, password)
+                else:
+                    self.metrics.inc("etap_ssh_reused_total")
+                try:
+                    chan = conn.transport.open_session(timeout=self.connect_timeout)
+                except (_paramiko().SSHException, EOFError, OSError):
+                    self._close(conn)
+                    if fresh:
+                        raise
+                    continue
+                try:
+                    with self.metrics.timer("etap_ssh_phase_seconds", phase="exec"):
+                        return self._exec(chan, cmd)
+                finally:
+                    chan.close()
+                    conn.last_used = time.monotonic()
+                    if conn.stale:
+                        self._close(conn)
+
+    def _exec(self, chan, cmd):
+        # Komut bitene (çıkış kodu gelene) kadar çıktı okunur; kanal erken
+        # kapatılırsa komut yarıda kesilebilir
+        t0 = time.monotonic()
+        deadline = t0 + self.command_timeout
+        out, err = bytearray(), bytearray()
+        chan.exec_command(cmd)
+        while True:
+            # Çıktının tamamı okunur ama yalnızca başı saklanır
+            if chan.recv_ready():
+                data = chan.recv(4096)
+                out += data[:max(0, OUTPUT_LIMIT - len(out))]
+            elif chan.recv_stderr_ready():
+                data = chan.recv_stderr(4096)
+                err += data[:max(0, OUTPUT_LIMIT - len(err))]
+            elif chan.exit_status_ready():
+                break
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout(f"komut {self.command_timeout} sn içinde bitmedi")
+                chan.status_event.wait(min(remaining, 0.05))
+        return CommandResult(
+            chan.recv_exit_status(),
+            out.decode(errors="replace").strip(),
+            err.decode(errors="replace").strip(),
+            time.monotonic() - t0,
+        )
+
+    def close_all(self):
+        with self._lock:
+            conns = list(self._conns.values())
+            self._conns.clear()
+        for conn in conns:
+            with conn.lock:
+                self._close(conn)
+
+    def _get(self, ip, user, password):
+        key = (ip, user, password)
+        with self._lock:
+            # Kullanıcı/parola değişirse eski oturum kullanılmaz
+            stale = [self._conns.pop(k) for k in [k for k in self._conns if k[0] == ip and k != key]]
+            conn = self._conns.get(key)
+            if conn is None:
+                conn = self._conns[key] = _Connection()
+            self._conns.move_to_end(key)
+            # Dosya tanıtıcısı sınırı: en eski boştaki oturumlar çıkarılır
+            excess = len(self._conns) - self.max_connections
+            if excess > 0:
+                idle = [k for k, c in self._conns.items() if k != key and not c.lock.locked()][:excess]
+                stale += [self._conns.pop(k) for k in idle]
+                self.metrics.inc("etap_ssh_evicted_total", len(idle))
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, daemon=True)
+                self._reaper.start()
+        for old in stale:
+            self._retire(old)
+        return conn
+
+    def _retire(self, conn):
+        # Havuzdan çıkarılmış oturum: süren bir komut varsa bitmesi beklenir
+        # (havuz kilidi bu sırada tutulmaz); o sırada oturumu almış bir iş
+        # parçacığı varsa komutundan sonra kapatır
+        conn.stale = True
+        with conn.lock:
+            self._close(conn)
+
+    def _connect(self, ip, user, password):
+        # Aşama süreleri: TCP bağlantısı, anahtar değişimi, parola doğrulama
+        self.metrics.inc("etap_ssh_connects_total")
+        with self.metrics.timer("etap_ssh_phase_seconds", phase="connect"):
+            sock = socket.create_connection(split_address(ip, self.port), timeout=self.connect_timeout)
+        transport = _paramiko().Transport(sock)
+        try:
+            transport.banner_timeout = self.connect_timeout
+            transport.auth_timeout = self.connect_timeout
+            with self.metrics.timer("etap_ssh_phase_seconds", phase="kex"):
+                transport.start_client(timeout=self.connect_timeout)
+            with self.metrics.timer("etap_ssh_phase_seconds", phase="auth"):
+                transport.auth_password(user, password)
+        except Exception:
+            transport.close()
+            raise
+        transport.set_keepalive(self.keepalive)
+        return transport
+
+    def _close(self, conn):
+        if conn.transport is not None:
+            conn.transport.close()
+            conn.transport = None
+
+    def _reap(self):
+        # Uzun süre kullanılmayan oturumları kapat (tahta kapatılmış olabilir)
+        while True:
+            time.sleep(min(30, self.idle_timeout))
+            # Kapatılan oturumlar havuzdan da çıkar; girdiler birikmez
+            now = time.monotonic()
+            with self._lock:
+                idle = [k for k, c in self._conns.items() if now - c.last_used > self.idle_timeout and not c.lock.locked()]
+                idle = [self._conns.pop(k) for k in idle]
+            for conn in idle:
+                self._retire(conn)
+
+
+class FanOut:
+    """Aynı işlemi sınırlı sayıda işçiyle tüm tahtalara paralel uygular.
+
+    Her tahta için bir BoardResult üretilir; süresini (deadline) aşan tahta
+    beklenmez, zaman aşımı olarak raporlanır. fn bir CommandResult döndürürse
+    sıfırdan farklı çıkış kodu EXIT_FAILED sayılır.
+    """
+
+    def __init__(self, workers=32, deadline=15, metrics=METRICS):
+        self.workers = max(1, workers)
+        self.deadline = deadline
+        self.metrics = metrics
+
+    def run(self, ips, fn, on_result=None):
+        ips = list(dict.fromkeys(ips))
+        if not ips:
+            return []
+        results = {}
+        started = {}
+
+        def task(ip):
+            started[ip] = t0 = time.monotonic()
+            try:
+                with self.metrics.inflight("etap_commands_inflight"):
+                    out = fn(ip)
+            except Exception as e:
+                return BoardResult(ip, classify_error(e), str(e) or type(e).__name__, time.monotonic() - t0)
+            return to_result(ip, out, time.monotonic() - t0)
+
+        def report(res):
+            results[res.ip] = res
+            self.metrics.inc("etap_commands_total", status=res.status)
+            self.metrics.observe("etap_command_seconds", res.elapsed)
+            if on_result:
+                on_result(res)
+
+        ex = ThreadPoolExecutor(max_workers=min(self.workers, len(ips)))
+        try:
+            futures = {ex.submit(task, ip): ip for ip in ips}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    report(fut.result())
+                now = time.monotonic()
+                for fut in list(pending):
+                    t0 = started.get(futures[fut])
+                    if t0 is not None and now - t0 > self.deadline:
+                        # İşçi iş parçacığı arka planda bitince sonucu yok sayılır
+                        pending.discard(fut)
+                        report(BoardResult(futures[fut], TIMEOUT, "süre aşıldı", now - t0))
+        finally:
+            ex.shutdown(wait=False, cancel_futures=True)
+        return [results[ip] for ip in ips]
@@ -0,0 +1,216 @@
+import threading
+from datetime import datetime, timedelta
+
+from etap_data import DataManager
+from etap_scanner import address_key
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class BoardStateTable:
+    """IP başına istenen durum, son doğrulanan durum, son temas ve son hata.
+
+    Elle yapılan işlemler ve zil dalgaları yalnızca doğrulanmış durumu
+    istenenden farklı olan tahtalara gönderilir. Doğrulama max_age saniyeden
+    eskiyse (tahtada elle açılmış olabilir) durum bilinmiyor sayılır.
+    """
+
+    def __init__(self, path=DataManager.STATE_FILE, max_age=3600):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._boards = DataManager.load_json(path, {}) if path else {}
+
+    def get(self, ip):
+        with self._lock:
+            return dict(self._boards.get(ip, {}))
+
+    def snapshot(self):
+        with self._lock:
+            return {ip: dict(st) for ip, st in self._boards.items()}
+
+    def pending(self, ips, action, force=False):
+        # İstenen durumu kaydeder ve komut gönderilmesi gereken tahtaları döndürür
+        limit = (datetime.now() - timedelta(seconds=self.max_age)).isoformat(timespec="seconds")
+        out = []
+        with self._lock:
+            for ip in ips:
+                st = self._boards.setdefault(ip, {})
+                st["desired"] = action
+                fresh = st.get("confirmed_at", "") >= limit
+                if force or st.get("confirmed") != action or not fresh:
+                    out.append(ip)
+        return out
+
+    def expect(self, ips, action):
+        # Tahta durumu kendisi değiştiriyor (ajanın yerel zili): istenen durum
+        # kaydedilir, doğrulanan durum bilinmiyor sayılır; elle verilen sonraki
+        # komut atlanmaz
+        with self._lock:
+            for ip in ips:
+                st = self._boards.setdefault(ip, {})
+                st["desired"] = action
+                st.pop("confirmed", None)
+        self.save()
+
+    def record(self, results, action):
+        with self._lock:
+            for res in results:
+                st = self._boards.setdefault(res.ip, {})
+                if res.ok:
+                    st.update(confirmed=action, confirmed_at=_now(), last_contact=_now(), last_error="")
+                else:
+                    # Komutun uygulanıp uygulanmadığı bilinmiyor
+                    st.pop("confirmed", None)
+                    st["last_error"] = f"{res.status}: {res.error}"
+        self.save()
+
+    def forget(self, ips=None):
+        with self._lock:
+            if ips is None:
+                self._boards.clear()
+            else:
+                for ip in ips:
+                    self._boards.pop(ip, None)
+        self.save()
+
+    def save(self):
+        if self.path:
+            DataManager.save_later(self.path, self.snapshot())
+
+
+# Tahta kaydında düzenlenebilen alanlar
+BOARD_FIELDS = ("name", "room", "floor", "tags")
+
+
+def board_labels(st):
+    # Grup adları: serbest etiketler ile "kat:2", "oda:B12" gibi konum etiketleri
+    labels = set(st.get("tags", ()))
+    if st.get("floor") not in (None, ""):
+        labels.add(f"kat:{st['floor']}")
+    if st.get("room"):
+        labels.add(f"oda:{st['room']}")
+    return labels
+
+
+class BoardInventory:
+    """Bulunan tahtaların kalıcı kaydı (tahtalar.json).
+
+    Her tahta için ilk/son görülme zamanı ile ad, oda, kat ve etiketler tutulur.
+    Etiketten tahta kümesine bir dizin bellekte güncel tutulur; members()
+    bir grubu tüm listeyi dolaşmadan çözer.
+    """
+
+    def __init__(self, path=DataManager.IPS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._boards = {}
+        self._index = {}
+        self.reload()
+
+    def reload(self):
+        data = DataManager.load_json(self.path, {}) if self.path else {}
+        # Eski sürümler yalnızca IP listesi kaydediyordu
+        if isinstance(data, list):
+            data = {ip: {} for ip in data}
+        with self._lock:
+            self._boards = data
+            self._reindex()
+
+    def _reindex(self):
+        self._index = {}
+        for ip, st in self._boards.items():
+            for label in board_labels(st):
+                self._index.setdefault(label, set()).add(ip)
+
+    def _update(self, ip, **fields):
+        # Kilit tutulurken çağrılır; tahtanın dizindeki yeri de güncellenir
+        st = self._boards.setdefault(ip, {})
+        for label in board_labels(st):
+            members = self._index[label]
+            members.discard(ip)
+            if not members:
+                del self._index[label]
+        for key, value in fields.items():
+            if value in (None, "", []):
+                st.pop(key, None)
+            else:
+                st[key] = value
+        for label in board_labels(st):
+            self._index.setdefault(label, set()).add(ip)
+
+    def members(self, label):
+        # Grubun tahtaları (adres sırasıyla); bilinmeyen grup için None
+        with self._lock:
+            ips = self._index.get(label)
+            return None if ips is None else sorted(ips, key=address_key)
+
+    def labels(self):
+        # {grup adı: tahta sayısı}
+        with self._lock:
+            return {label: len(ips) for label, ips in sorted(self._index.items())}
+
+    def describe(self, ip, **fields):
+        unknown = set(fields) - set(BOARD_FIELDS)
+        if unknown:
+            raise ValueError(f"bilinmeyen alan: {', '.join(sorted(unknown))}")
+        with self._lock:
+            self._update(ip, **fields)
+        self.save()
+
+    def tag(self, ips, tag, remove=False):
+        tag = tag.strip()
+        if not tag or ":" in tag:
+            raise ValueError(f"geçersiz etiket: {tag!r} (boş olamaz, ':' içeremez)")
+        with self._lock:
+            for ip in ips:
+                tags = set(self._boards.get(ip, {}).get("tags", ()))
+                tags = tags - {tag} if remove else tags | {tag}
+                self._update(ip, tags=sorted(tags))
+        self.save()
+
+    def ips(self):
+        with self._lock:
+            return sorted(self._boards, key=address_key)
+
+    def get(self, ip):
+        with self._lock:
+            return dict(self._boards.get(ip, {}))
+
+    def __contains__(self, ip):
+        return ip in self._boards
+
+    def __len__(self):
+        return len(self._boards)
+
+    def seen(self, ips):
+        now = _now()
+        with self._lock:
+            for ip in ips:
+                st = self._boards.setdefault(ip, {})
+                st.setdefault("first_seen", now)
+                st["last_seen"] = now
+        self.save()
+
+    def replace(self, ips):
+        # Tam taramada görülmeyen tahtalar envanterden çıkarılır; adı, odası
+        # ya da etiketi girilmiş olanlar (o gün kapalı olabilir) kalır
+        with self._lock:
+            kept = {ip: st for ip, st in self._boards.items() if any(k in st for k in BOARD_FIELDS)}
+            self._boards = {**kept, **{ip: self._boards.get(ip, {}) for ip in ips}}
+            self._reindex()
+        self.seen(ips)
+
+    def clear(self):
+        with self._lock:
+            self._boards.clear()
+            self._index.clear()
+        self.save()
+
+    def save(self):
+        if self.path:
+            with self._lock:
+                data = {ip: dict(st) for ip, st in self._boards.items()}
+            DataManager.save_later(self.path, data)
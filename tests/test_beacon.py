@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from etap_agent import BoardAgent
+from etap_beacon import CHUNK, PACKET_LIMIT, Beacon, pack, unpack
+from etap_schedule import schedule_digest, split_days
+
+KEY = b"s3cret"
+PEER = "127.0.0.1"
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    # Ajan program.json'u çalışma klasöründe tutar; komutlar çalıştırılmaz
+    monkeypatch.chdir(tmp_path)
+    agent = BoardAgent(KEY, enforce=False)
+    agent.ran = []
+    run = agent.run
+
+    def fake_run(msg):
+        if msg.get("action") in ("lock", "unlock"):
+            agent.ran.append(msg["action"])
+            return {"exit_code": 0, "stdout": "", "stderr": ""}
+        return run(msg)
+
+    agent.run = fake_run
+    return agent
+
+
+def message(**fields):
+    return {"id": fields.pop("id", "abc"), "ts": fields.pop("ts", time.time()), **fields}
+
+
+def test_pack_round_trip():
+    msg = {"id": "1", "action": "lock", "targets": ["10.0.0.1"], "not": "çğş"}
+    assert unpack(KEY, pack(KEY, msg)) == msg
+
+
+def test_unpack_rejects_tampering_and_wrong_key():
+    data = pack(KEY, {"id": "1", "action": "lock"})
+    assert unpack(b"baska", data) is None
+    assert unpack(KEY, data.replace(b"lock", b"kcol")) is None
+    assert unpack(KEY, b"imza") is None
+    # İmzası doğru ama nesne olmayan gövde
+    assert unpack(KEY, pack(KEY, [1, 2])) is None
+
+
+def test_agent_runs_signed_command_and_acks(agent):
+    reply = unpack(KEY, agent.handle(pack(KEY, message(action="lock")), PEER))
+    assert agent.ran == ["lock"]
+    assert reply["id"] == "abc" and reply["exit_code"] == 0
+    assert reply["digest"] == agent.digest
+
+
+@pytest.mark.parametrize("skew", [-120, 120])
+def test_agent_ignores_old_or_future_packets(agent, skew):
+    assert agent.handle(pack(KEY, message(action="lock", ts=time.time() + skew)), PEER) is None
+    assert agent.ran == []
+
+
+def test_agent_ignores_unsigned_packets(agent):
+    assert agent.handle(pack(b"baska", message(action="lock")), PEER) is None
+    assert agent.ran == []
+
+
+def test_replayed_packet_runs_once(agent):
+    data = pack(KEY, message(action="lock"))
+    first = agent.handle(data, PEER)
+    assert agent.handle(data, PEER) == first
+    assert agent.ran == ["lock"]
+
+
+def test_agent_skips_packets_for_other_boards(agent):
+    assert agent.handle(pack(KEY, message(action="lock", targets=["10.9.9.9"])), PEER) is None
+    assert agent.handle(pack(KEY, message(id="x", action="unlock", targets=[PEER])), PEER) is not None
+    assert agent.ran == ["unlock"]
+
+
+def test_agent_applies_schedule_parts(agent):
+    schedule = {"Pazartesi": [{"start": f"{h:02d}:00", "end": f"{h:02d}:40", "action": "unlock"} for h in range(8, 17)]}
+    digest = schedule_digest(schedule)
+    parts = split_days(schedule, 200)
+    assert len(parts) > 1
+    for i, part in enumerate(parts):
+        msg = message(id=f"p{i}", action="sync", digest=digest, part=i, parts=len(parts), days=part)
+        reply = unpack(KEY, agent.handle(pack(KEY, msg), PEER))
+        assert reply["exit_code"] == 0
+    assert agent.digest == digest == reply["digest"]
+    assert agent.schedule == schedule
+
+    # Fark: tabanı tutmayan tahta tam program ister
+    msg = message(id="d", action="sync", digest="x", base="eski", part=0, parts=1, days={"Salı": []})
+    assert unpack(KEY, agent.handle(pack(KEY, msg), PEER))["exit_code"] == 3
+    changed = dict(schedule, Salı=[])
+    msg = message(id="d2", action="sync", digest=schedule_digest(changed), base=digest, part=0, parts=1, days={"Salı": []})
+    assert unpack(KEY, agent.handle(pack(KEY, msg), PEER))["exit_code"] == 0
+    assert agent.schedule == changed
+
+
+def test_beacon_packets_stay_below_limit():
+    beacon = Beacon(KEY)
+    targets = [f"10.46.{i // 250}.{i % 250 + 1}" for i in range(500)]
+    msg = {"id": "a" * 16, "ts": time.time(), "action": "sync", "days": {"Pazartesi": ["x" * 600]}}
+    packets = beacon._packets(msg, targets)
+    assert max(map(len, packets)) <= PACKET_LIMIT
+    seen = [ip for data in packets for ip in unpack(KEY, data)["targets"]]
+    assert seen == targets
+    small = beacon._packets({"id": "b", "ts": 0, "action": "lock"}, targets)
+    assert max(len(unpack(KEY, data)["targets"]) for data in small) == CHUNK
+
+
+def test_beacon_rejects_oversized_packets():
+    with pytest.raises(ValueError):
+        Beacon(KEY).send("sync", ["10.0.0.1"], everyone=True, extra={"days": "x" * PACKET_LIMIT})
@@ -0,0 +1,153 @@
+import json
+import socket
+import threading
+
+import pytest
+
+from etap_control import ControlClient, ControlServer, main
+from etap_ssh import OK, TIMEOUT, BoardResult
+
+
+class Inventory:
+    def __init__(self):
+        self.described = []
+
+    def ips(self):
+        return ["10.0.0.1", "10.0.0.2"]
+
+    def describe(self, ip, **fields):
+        self.described.append((ip, fields))
+
+    def tag(self, ips, tag, remove=False):
+        self.described.append((ips, {"tag": tag}))
+
+
+class Service:
+    def __init__(self):
+        self.inventory = Inventory()
+        self.applied = []
+
+    def group(self, name):
+        if name != "fen":
+            raise ValueError(f"bilinmeyen grup: {name}")
+        return ["10.0.0.2"]
+
+    def apply(self, ips, action, force=False, on_result=None, source=""):
+        self.applied.append((ips, action, force, source))
+        results = [BoardResult(ip, OK if ip.endswith("1") else TIMEOUT) for ip in ips]
+        for res in results:
+            on_result(res)
+        return results, 0
+
+    def boards_seen(self, ips, replace=False):
+        self.inventory.described.append((ips, {}))
+
+    def reload(self):
+        raise RuntimeError("beklenmeyen hata")
+
+
+@pytest.fixture
+def control(tmp_path):
+    path = str(tmp_path / "k.sock")
+    service = Service()
+    server = ControlServer(service, path)
+    server.start()
+    yield service, ControlClient(path, timeout=5)
+    server.stop()
+
+
+def raw(client, data):
+    # Ham satır gönderir, yanıt satırlarını döndürür
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(client.path)
+        sock.sendall(data)
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("rb") as f:
+            return [json.loads(line) for line in f]
+
+
+def test_lock_streams_results_then_done(control):
+    service, client = control
+    msgs = list(client.request({"cmd": "lock", "ips": ["10.0.0.1", "10.0.0.2"], "source": "test"}))
+    assert [m.get("ip") for m in msgs[:2]] == ["10.0.0.1", "10.0.0.2"]
+    assert msgs[1]["status"] == TIMEOUT
+    assert msgs[-1]["done"] and msgs[-1]["skipped"] == 0
+    assert service.applied[0][3].startswith("test:")
+
+
+def test_group_is_resolved_by_service(control):
+    service, client = control
+    client.call({"cmd": "unlock", "group": "fen"})
+    ips, action, force, source = service.applied[0]
+    assert (ips, action, force) == (["10.0.0.2"], "unlock", False)
+    assert source.startswith("api:")
+    with pytest.raises(RuntimeError, match="bilinmeyen grup"):
+        client.call({"cmd": "lock", "group": "yok"})
+
+
+@pytest.mark.parametrize("req, error", [
+    ({"cmd": "yok"}, "bilinmeyen komut"),
+    ({"cmd": "lock"}, "eksik alan: ips"),
+    ({"cmd": "lock", "ips": "10.0.0.1"}, "IP listesi"),
+    ({"cmd": "lock", "ips": ["10.0.0.1", 5]}, "IP listesi"),
+    ({"cmd": "describe", "ip": ["10.0.0.1"], "name": "A"}, "IP adresi"),
+    ({"cmd": "reload"}, "RuntimeError: beklenmeyen hata"),
+])
+def test_errors_end_with_done(control, req, error):
+    _, client = control
+    with pytest.raises(RuntimeError, match=error):
+        client.call(req)
+
+
+def test_malformed_lines_get_an_answer(control):
+    _, client = control
+    replies = raw(client, b'[1, 2]\n{bozuk\n{"cmd": "boards"}\n')
+    assert replies[0] == {"error": "istek bir JSON nesnesi olmalı", "done": True}
+    assert replies[1]["done"] and replies[1]["error"]
+    assert replies[2] == {"done": True, "boards": ["10.0.0.1", "10.0.0.2"]}
+
+
+def test_describe_forwards_registry_fields_only(control):
+    service, client = control
+    client.call({"cmd": "describe", "ip": "10.0.0.1", "name": "A", "source": "panel"})
+    assert service.inventory.described == [("10.0.0.1", {"name": "A"})]
+
+
+def test_invalid_addresses_never_reach_the_inventory(control):
+    service, client = control
+    for req in ({"cmd": "tag", "ips": ["10.0.0.1", "tahta-1"], "tag": "fen"},
+                {"cmd": "seen", "ips": ["10.0.0.300"]},
+                {"cmd": "describe", "ip": "10.0.0.1:99999", "name": "A"}):
+        with pytest.raises(RuntimeError, match="geçersiz tahta adresi"):
+            client.call(req)
+    assert service.inventory.described == []
+
+
+def test_client_raises_when_stream_ends_without_done(tmp_path):
+    path = str(tmp_path / "k.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+
+    def serve():
+        conn, _ = listener.accept()
+        with conn:
+            conn.recv(1024)
+            conn.sendall(b'{"ip": "10.0.0.1", "status": "ok"}\n')
+
+    threading.Thread(target=serve, daemon=True).start()
+    try:
+        with pytest.raises(RuntimeError, match="tamamlanmadan"):
+            ControlClient(path, timeout=5).call({"cmd": "lock", "ips": ["10.0.0.1"]})
+    finally:
+        listener.close()
+
+
+@pytest.mark.parametrize("argv", [["history"], ["tag"], ["tag", "fen"], ["untag", "fen"]])
+def test_cli_prints_usage_for_missing_arguments(argv, monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["etap_control.py", *argv])
+    with pytest.raises(SystemExit) as exc:
+        main()
+    assert exc.value.code == 2
+    assert "Kullanım" in capsys.readouterr().err
@@ -0,0 +1,133 @@
+import time
+from datetime import datetime, timedelta
+
+from etap_retry import RetryQueue
+from etap_ssh import AUTH_FAILED, OK, TIMEOUT, BoardResult
+
+
+class Dispatcher:
+    def __init__(self, statuses):
+        # ip -> sırayla döndürülecek durumlar; son durum tekrar eder
+        self.statuses = statuses
+        self.calls = []
+
+    def __call__(self, ips, action):
+        self.calls.append((sorted(ips), action))
+        out = []
+        for ip in ips:
+            seq = self.statuses[ip]
+            out.append(BoardResult(ip, seq.pop(0) if len(seq) > 1 else seq[0]))
+        return out
+
+
+class Monitor:
+    def __init__(self, down=()):
+        self.down = set(down)
+
+    def is_down(self, ip):
+        return ip in self.down
+
+    def expedite(self, ips):
+        pass
+
+    def relax(self, ips):
+        pass
+
+
+def due_now(queue):
+    # Bekleme süresini atla: tüm kayıtlar hemen denensin
+    with queue._lock:
+        for entry in queue._queue.values():
+            entry.next_at = 0.0
+
+
+def step(queue):
+    for action, batch in queue._take_due().items():
+        queue._settle(batch, queue.dispatch(list(batch), action))
+
+
+def later(seconds=60):
+    return datetime.now() + timedelta(seconds=seconds)
+
+
+def test_retries_until_success():
+    dispatch = Dispatcher({"a": [TIMEOUT, OK]})
+    queue = RetryQueue(dispatch)
+    queue.submit(["a"], "lock", later())
+    due_now(queue)
+    step(queue)
+    assert queue.pending() == {"a": "lock"}
+    due_now(queue)
+    step(queue)
+    assert queue.pending() == {}
+    assert len(dispatch.calls) == 2
+
+
+def test_expired_deadline_is_dropped():
+    dispatch = Dispatcher({"a": [TIMEOUT]})
+    queue = RetryQueue(dispatch)
+    queue.submit(["a"], "unlock", later(0.05))
+    time.sleep(0.1)
+    due_now(queue)
+    step(queue)
+    assert queue.pending() == {}
+    assert dispatch.calls == []
+
+
+def test_past_deadline_is_not_queued():
+    queue = RetryQueue(Dispatcher({}))
+    queue.submit(["a"], "lock", datetime.now() - timedelta(seconds=1))
+    assert queue.pending() == {}
+
+
+def test_auth_failure_is_not_retried():
+    queue = RetryQueue(Dispatcher({"a": [AUTH_FAILED]}))
+    queue.submit(["a"], "lock", later())
+    due_now(queue)
+    step(queue)
+    assert queue.pending() == {}
+
+
+def test_down_boards_wait_for_kick():
+    monitor = Monitor(down=["a"])
+    dispatch = Dispatcher({"a": [OK]})
+    queue = RetryQueue(dispatch, monitor)
+    queue.submit(["a"], "lock", later())
+    due_now(queue)
+    step(queue)
+    assert dispatch.calls == []
+    monitor.down.clear()
+    queue.kick(["a"])
+    step(queue)
+    assert dispatch.calls == [(["a"], "lock")]
+
+
+def test_latest_action_wins():
+    queue = RetryQueue(Dispatcher({}))
+    queue.submit(["a", "b"], "lock", later())
+    queue.submit(["a"], "unlock", later())
+    assert queue.pending() == {"a": "unlock", "b": "lock"}
+
+
+def test_backoff_is_bounded():
+    queue = RetryQueue(Dispatcher({}), base=2, max_delay=10)
+    for attempt in range(8):
+        delay = queue._delay(attempt)
+        limit = min(10, 2 * 2 ** attempt)
+        assert limit / 2 <= delay <= limit
+
+
+def test_thread_retries_in_background():
+    dispatch = Dispatcher({"a": [TIMEOUT, OK]})
+    queue = RetryQueue(dispatch, base=0.05, max_delay=0.1)
+    queue.start()
+    try:
+        queue.submit(["a"], "lock", later())
+        for _ in range(50):
+            if not queue.pending():
+                break
+            time.sleep(0.05)
+        assert queue.pending() == {}
+        assert len(dispatch.calls) == 2
+    finally:
+        queue.stop()
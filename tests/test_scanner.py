@@ -0,0 +1,73 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from etap_metrics import Metrics
+from etap_scanner import NetworkScanner, TargetSet, check_address
+
+
+def test_parse_cidr_and_range():
+    hosts = TargetSet.parse("10.0.0.0/30, 10.0.1.5-10.0.1.6")
+    assert list(hosts) == ["10.0.0.1", "10.0.0.2", "10.0.1.5", "10.0.1.6"]
+
+
+def test_parse_exclusions_split_ranges():
+    hosts = TargetSet.parse("10.0.0.0/29 !10.0.0.3 !10.0.0.5-10.0.0.6")
+    assert list(hosts) == ["10.0.0.1", "10.0.0.2", "10.0.0.4"]
+    assert "10.0.0.4" in hosts
+    assert "10.0.0.3" not in hosts
+
+
+def test_parse_merges_overlaps():
+    hosts = TargetSet.parse("10.0.0.0/30 10.0.0.0/30;10.0.0.2")
+    assert len(hosts) == 2
+
+
+def test_without_known_boards():
+    hosts = TargetSet.parse("10.0.0.0/29").without(["10.0.0.1", "10.0.0.6:2222"])
+    assert list(hosts) == ["10.0.0.2", "10.0.0.3", "10.0.0.4", "10.0.0.5"]
+
+
+@pytest.mark.parametrize("text", ["", "  ", "!10.0.0.1", "10.0.0.0/33", "merhaba"])
+def test_parse_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        TargetSet.parse(text)
+
+
+def test_check_address():
+    assert check_address("10.0.0.1") == "10.0.0.1"
+    assert check_address("127.0.0.1:2201") == "127.0.0.1:2201"
+    for bad in ("tahta", "10.0.0", "10.0.0.256", "10.0.0.1:0", "10.0.0.1:ssh", ""):
+        with pytest.raises(ValueError):
+            check_address(bad)
+
+
+def test_inflight_gauge_is_shared_by_overlapping_scans():
+    metrics = Metrics()
+
+    def inflight():
+        return sum(g["value"] for g in metrics.snapshot()["gauges"] if g["name"] == "etap_scan_inflight")
+
+    # Kabul kuyruğu dolu dinleyici: sonraki bağlantılar zaman aşımına kadar sürer
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(0)
+    addr = f"127.0.0.1:{listener.getsockname()[1]}"
+    slow = NetworkScanner(concurrency=8, timeout=1.0, metrics=metrics)
+    worker = threading.Thread(target=slow.scan, args=([addr] * 8,))
+    worker.start()
+    deadline = time.monotonic() + 2
+    while inflight() == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    if inflight() == 0:
+        worker.join()
+        listener.close()
+        pytest.skip("ağ denemeleri hemen sonuçlandı")
+    # Aynı anda biten başka bir tarama göstergeyi sıfırlamaz
+    NetworkScanner(metrics=metrics).scan([])
+    assert inflight() > 0
+    worker.join()
+    listener.close()
+    assert inflight() == 0
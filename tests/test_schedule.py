@@ -0,0 +1,136 @@
+from datetime import datetime
+
+import pytest
+
+from etap_schedule import BellScheduler, CompiledSchedule, ScheduleError, merge_days, parse_time, split_days
+
+# 2026-10-19 bir pazartesi
+MONDAY = datetime(2026, 10, 19)
+
+
+def at(hour, minute, day=0):
+    return MONDAY.replace(day=MONDAY.day + day, hour=hour, minute=minute)
+
+
+def compile_(slots, day="Pazartesi"):
+    return CompiledSchedule.compile({day: slots})
+
+
+def test_parse_time_accepts_colon_and_dot():
+    assert parse_time("08:50") == parse_time("08.50") == 530
+    assert parse_time("8:05") == 485
+    with pytest.raises(ValueError):
+        parse_time("24:00")
+
+
+def test_half_open_intervals():
+    sched = compile_([
+        {"start": "08:10", "end": "08:50", "action": "unlock"},
+        {"start": "08:50", "end": "09:00", "action": "lock"},
+    ])
+    assert sched.slot_at(at(8, 9)) is None
+    assert sched.slot_at(at(8, 10))["action"] == "unlock"
+    assert sched.slot_at(at(8, 49))["action"] == "unlock"
+    # Bitiş dakikasında sonraki dilim geçerli
+    assert sched.slot_at(at(8, 50))["action"] == "lock"
+    assert sched.slot_at(at(9, 0)) is None
+    assert sched.slot_end(at(8, 20)) == at(8, 50)
+
+
+def test_slots_are_sorted_and_normalized():
+    sched = compile_([
+        {"start": "10:00", "end": "10.30", "action": "lock"},
+        {"start": "8:00", "end": "09:00", "action": "unlock"},
+    ])
+    assert sched.slot_at(at(8, 30)) == {"start": "08:00", "end": "09:00", "action": "unlock"}
+    assert sched.slot_at(at(10, 15))["end"] == "10:30"
+
+
+def test_next_transition_wraps_to_next_days():
+    sched = compile_([{"start": "08:00", "end": "09:00", "action": "unlock"}], day="Çarşamba")
+    when, slot = sched.next_transition(at(12, 0))
+    assert when == at(8, 0, day=2)
+    when, _ = sched.next_transition(at(8, 0, day=2))
+    assert when == at(8, 0, day=9)
+    assert CompiledSchedule.compile({}).next_transition(at(8, 0)) is None
+
+
+def test_errors_are_reported_per_row():
+    bad = [
+        {"start": "09:00", "end": "08:00", "action": "lock"},
+        {"start": "08:00", "end": "09:00", "action": "sil"},
+        {"start": "08:00", "action": "lock"},
+        {"start": "10:00", "end": "11:00", "action": "lock"},
+        {"start": "10:30", "end": "11:30", "action": "unlock"},
+    ]
+    with pytest.raises(ScheduleError) as exc:
+        compile_(bad)
+    errors = exc.value.errors
+    assert [e.split(":")[0] for e in errors] == [
+        "Pazartesi satır 1", "Pazartesi satır 2", "Pazartesi satır 3", "Pazartesi satır 5"]
+    lenient = CompiledSchedule.compile({"Pazartesi": bad, "Bayram": []}, strict=False)
+    assert len(lenient.errors) == 5
+    assert lenient.slot_at(at(10, 45))["action"] == "lock"
+
+
+def test_groups_compile_separately():
+    sched = compile_([
+        {"start": "08:00", "end": "09:00", "action": "lock"},
+        {"start": "08:30", "end": "08:40", "action": "unlock", "group": "fen"},
+        {"start": "08:35", "end": "08:45", "action": "unlock", "group": "kat:2"},
+    ])
+    assert sched.group_names() == ["fen", "kat:2"]
+    assert sched.slot_at(at(8, 32))["action"] == "lock"
+    assert sched.slot_at(at(8, 32), "fen")["group"] == "fen"
+    assert sched.slot_at(at(8, 32), "kat:2") is None
+    assert [s.get("group") for s in sched.slots_at(at(8, 36))] == [None, "fen", "kat:2"]
+    assert sched.next_transition(at(8, 30)) == (at(8, 35), sched.slot_at(at(8, 35), "kat:2"))
+
+
+def test_overlap_is_checked_within_group_only():
+    with pytest.raises(ScheduleError):
+        compile_([
+            {"start": "08:00", "end": "09:00", "action": "lock", "group": "fen"},
+            {"start": "08:30", "end": "09:30", "action": "unlock", "group": "fen"},
+        ])
+
+
+def test_group_slot_end_reverts_to_whole_school_slot():
+    sched = compile_([
+        {"start": "08:00", "end": "09:00", "action": "lock"},
+        {"start": "08:30", "end": "08:40", "action": "unlock", "group": "fen"},
+        {"start": "08:50", "end": "09:00", "action": "unlock", "group": "fen"},
+    ])
+    # İç içe grup diliminin bitişi de bir geçiştir
+    assert sched.next_transition(at(8, 31))[0] == at(8, 40)
+    assert sched.next_transition(at(8, 40))[0] == at(8, 50)
+    assert sched.reverts_at(at(8, 40)) == [{"start": "08:00", "end": "09:00", "action": "lock", "group": "fen"}]
+    # Tüm okul dilimi de bitiyorsa ya da hiç yoksa grup için yapılacak bir şey yok
+    assert sched.reverts_at(at(9, 0)) == []
+    assert sched.reverts_at(at(8, 35)) == []
+
+
+def test_bell_scheduler_reapplies_covering_slot_when_group_slot_ends():
+    sched = compile_([
+        {"start": "08:00", "end": "09:00", "action": "lock"},
+        {"start": "08:30", "end": "08:40", "action": "unlock", "group": "fen"},
+    ])
+    waves = []
+    bell = BellScheduler(lambda: sched, lambda: ["10.0.0.1", "10.0.0.2"],
+                         lambda ips, action, group=None: waves.append((ips, action, group)) or [],
+                         resolve_group=lambda name: ["10.0.0.2"])
+    bell._fire(sched.reverts_at(at(8, 40)))
+    assert waves == [(["10.0.0.2"], "lock", "fen")]
+
+
+@pytest.mark.parametrize("limit", [80, 300, 5000])
+def test_split_days_round_trip(limit):
+    days = {
+        "Pazartesi": [{"start": f"{h:02d}:00", "end": f"{h:02d}:40", "action": "unlock"} for h in range(8, 17)],
+        "Salı": [],
+        "Pazar": None,
+    }
+    parts = split_days(days, limit)
+    assert merge_days(parts) == days
+    if limit == 5000:
+        assert len(parts) == 1
@@ -0,0 +1,69 @@
+import pytest
+
+from etap_data import DataManager
+from etap_schedule import schedule_digest
+from etap_service import EtapService
+from etap_ssh import CommandResult
+
+IPS = ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+
+
+class Beacon:
+    # Onay veren tahtalar: yalnızca hedeflenenler ya da hedefsiz pakette hepsi
+    def __init__(self, agents):
+        self.agents = agents
+        self.sent = []
+
+    def send(self, action, targets, everyone=False, extra=None):
+        self.sent.append((action, sorted(targets), everyone))
+        acked = self.agents if everyone else [ip for ip in targets if ip in self.agents]
+        return {ip: {"exit_code": 0, "elapsed": 0.01} for ip in acked}
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    svc = EtapService(get_targets=lambda: list(IPS))
+    svc.beacon = Beacon(list(IPS))
+    svc.executed = []
+    svc.execute = lambda ip, action: svc.executed.append((ip, action)) or CommandResult(0)
+    yield svc
+    svc.journal.close()
+    DataManager.flush()
+
+
+def test_wave_broadcasts_only_when_nothing_is_skipped(service):
+    service.run_wave(IPS, "lock")
+    assert service.beacon.sent == [("lock", IPS, True)]
+
+
+def test_wave_targets_packet_when_a_board_is_down(service):
+    service.monitor.is_down = lambda ip: ip == "10.0.0.3"
+    service.run_wave(IPS, "lock")
+    assert service.beacon.sent == [("lock", IPS[:2], False)]
+
+
+def test_dispatch_targets_packet_when_a_board_is_already_in_state(service):
+    service.apply(["10.0.0.1"], "lock")
+    service.beacon.sent.clear()
+    results = service.dispatch(IPS, "lock", everyone=True)
+    assert service.beacon.sent == [("lock", IPS[1:], False)]
+    assert sorted(r.ip for r in results) == IPS[1:]
+
+
+def test_group_wave_is_never_broadcast(service):
+    service.run_wave(IPS[:2], "unlock", group="fen")
+    assert service.beacon.sent == [("unlock", IPS[:2], False)]
+
+
+def test_local_bell_boards_are_not_trusted_as_confirmed(service):
+    # Elle açılan tahta, programı güncel olduğu için zili kendisi uygular
+    service.apply(["10.0.0.1"], "unlock")
+    service.synced["10.0.0.1"] = schedule_digest(service.schedule)
+    service.beacon.sent.clear()
+    service.run_wave(IPS, "lock")
+    assert service.beacon.sent == [("lock", IPS[1:], False)]
+    assert service.states.get("10.0.0.1")["desired"] == "lock"
+    # Öğretmenin sonraki açma komutu "zaten açık" sayılıp atlanmamalı
+    results, skipped = service.apply(["10.0.0.1"], "unlock")
+    assert [r.ip for r in results] == ["10.0.0.1"] and skipped == 0
@@ -0,0 +1,50 @@
+from etap_metrics import Metrics
+from etap_ssh import SSHPool
+
+
+class Transport:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def pool_with(n, **kw):
+    pool = SSHPool(max_connections=n, metrics=Metrics(), **kw)
+    pool._reaper = object()  # arka plan temizleyicisi testte çalışmasın
+    return pool
+
+
+def connect(pool, ip, user="u", password="p"):
+    conn = pool._get(ip, user, password)
+    conn.transport = Transport()
+    return conn
+
+
+def test_pool_evicts_least_recently_used_idle_connection():
+    pool = pool_with(2)
+    a, b = connect(pool, "10.0.0.1"), connect(pool, "10.0.0.2")
+    assert pool._get("10.0.0.1", "u", "p") is a
+    c = connect(pool, "10.0.0.3")
+    assert [k[0] for k in pool._conns] == ["10.0.0.1", "10.0.0.3"]
+    assert b.stale and b.transport is None
+    assert not a.stale and not c.stale
+
+
+def test_busy_connections_are_not_evicted():
+    pool = pool_with(1)
+    a = connect(pool, "10.0.0.1")
+    with a.lock:
+        connect(pool, "10.0.0.2")
+    assert len(pool._conns) == 2 and not a.stale
+    connect(pool, "10.0.0.3")
+    assert [k[0] for k in pool._conns] == ["10.0.0.3"]
+
+
+def test_credential_change_retires_old_connection():
+    pool = pool_with(8)
+    old = connect(pool, "10.0.0.1")
+    new = connect(pool, "10.0.0.1", password="yeni")
+    assert old.stale and old.transport is None and new is not old
+    assert list(pool._conns) == [("10.0.0.1", "u", "yeni")]
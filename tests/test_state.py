@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from etap_ssh import OK, TIMEOUT, BoardResult
+from etap_state import BoardStateTable
+
+IPS = ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+
+
+def table(max_age=3600):
+    # path=None: diske yazılmaz
+    return BoardStateTable(path=None, max_age=max_age)
+
+
+def test_unknown_boards_are_pending():
+    assert table().pending(IPS, "lock") == IPS
+
+
+def test_confirmed_boards_are_skipped():
+    st = table()
+    st.record([BoardResult("10.0.0.1", OK), BoardResult("10.0.0.2", TIMEOUT, "zaman aşımı")], "lock")
+    assert st.pending(IPS, "lock") == ["10.0.0.2", "10.0.0.3"]
+    # Diğer işlem için hepsi gönderilir
+    assert st.pending(IPS, "unlock") == IPS
+    assert st.get("10.0.0.1")["desired"] == "unlock"
+
+
+def test_force_sends_to_all():
+    st = table()
+    st.record([BoardResult(ip, OK) for ip in IPS], "lock")
+    assert st.pending(IPS, "lock") == []
+    assert st.pending(IPS, "lock", force=True) == IPS
+
+
+def test_stale_confirmation_is_pending():
+    st = table(max_age=60)
+    st.record([BoardResult("10.0.0.1", OK)], "lock")
+    old = (datetime.now() - timedelta(seconds=120)).isoformat(timespec="seconds")
+    st._boards["10.0.0.1"]["confirmed_at"] = old
+    assert st.pending(["10.0.0.1"], "lock") == ["10.0.0.1"]
+
+
+def test_failure_clears_confirmation():
+    st = table()
+    st.record([BoardResult("10.0.0.1", OK)], "lock")
+    st.record([BoardResult("10.0.0.1", TIMEOUT, "zaman aşımı")], "lock")
+    assert st.pending(["10.0.0.1"], "lock") == ["10.0.0.1"]
+    assert st.get("10.0.0.1")["last_error"] == "timeout: zaman aşımı"